@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from air_data_preprocessor import (MONTH_FILES, TRAINING_STATIONS, RunningMinMaxScaler, StationCatalog, AIR_DATA_DIR,
+                                   feature_gases, load_air_frames, station_frame)
+from air_sequences import make_windows
+from air_training import configure_threads, training_pool, worker_threads
+
+
+# Rolling-origin folds over consecutive months: train on `train_size` months, test on the next one,
+# then move the cut forward by `step` months. expanding=True keeps the first month in every fold.
+# walk_forward_folds(['jan', 'feb', 'mar', 'apr', 'may']) ->
+#   [(('jan', 'feb', 'mar'), 'apr'), (('feb', 'mar', 'apr'), 'may')]
+def walk_forward_folds(months, train_size=3, step=1, expanding=False):
+    months = list(months)
+    return [(tuple(months[0 if expanding else end - train_size:end]), months[end])
+            for end in range(train_size, len(months), step)]
+
+
+def _default_catalog(month):
+    return StationCatalog.from_csv(f"{AIR_DATA_DIR}/{MONTH_FILES[month]}")
+
+
+# One continuous (unscaled) frame per station over all `months`, loaded and aligned once for every fold
+def load_backtest_frames(catalog=None, stations=TRAINING_STATIONS, months=tuple(MONTH_FILES), gap_fill="interpolate",
+                         gap_limit=None, **load_kwargs):
+    if catalog is None:
+        catalog = _default_catalog(months[0])
+
+    gases = sorted({gas for station in stations for gas in feature_gases(catalog, station)})
+    frames = load_air_frames(catalog, stations, gases, months, **load_kwargs)
+
+    series = {}
+    for station in stations:
+        gas_frames = {gas: pd.concat([frames[(station, gas, month)] for month in months], ignore_index=True)
+                      for gas in feature_gases(catalog, station)}
+        series[station], _ = station_frame(station, gas_frames, gap_fill, gap_limit)
+    return series
+
+
+# Shared state of a backtest, built once: every station's series is written to
+# {directory}/series_<station>.npy, which the fold workers memory-map, so no fold re-reads or re-aligns the data.
+# Each fold is scaled with the min/max of its own train months over all stations (combined from the
+# per-month ranges kept here), so no fold sees the range of its test month. A fitted `scaler`
+# (e.g. the one saved with the models) is used for every fold instead.
+# The columns are the station's feature_gases (CO in place of O3 at 28079004), taken from `catalog`.
+def prepare_backtest(frames_by_station, directory="backtest", scaler=None, catalog=None):
+    os.makedirs(directory, exist_ok=True)
+    if catalog is None:
+        catalog = _default_catalog(next(iter(MONTH_FILES)))
+
+    month_names = list(MONTH_FILES)
+    paths, month_rows, month_scalers = {}, {}, {}
+    for station, frame in frames_by_station.items():
+        values = frame.to_numpy(dtype=np.float32)
+        paths[station] = os.path.join(directory, f"series_{station}.npy")
+        np.save(paths[station], values)
+
+        # Row range of each month; the frame is sorted by observedAt, so every month is contiguous
+        month_numbers = frame.index.get_level_values('observedAt').month.to_numpy()
+        month_rows[station] = {}
+        for number in np.unique(month_numbers):
+            rows = np.flatnonzero(month_numbers == number)
+            month = month_names[number - 1]
+            month_rows[station][month] = (int(rows[0]), int(rows[-1]) + 1)
+            month_scalers.setdefault(month, RunningMinMaxScaler()).partial_fit(values[rows[0]:rows[-1] + 1])
+
+    gases = {station: feature_gases(catalog, station) for station in frames_by_station}
+    return {'paths': paths, 'month_rows': month_rows, 'gases': gases, 'scaler': scaler,
+            'month_ranges': {month: (s.data_min, s.data_max) for month, s in month_scalers.items()}}
+
+
+# The scaler of a fold: the fixed one if prepare_backtest was given one, otherwise fitted on the train months
+def fold_scaler(prepared, train_months):
+    if prepared['scaler'] is not None:
+        return prepared['scaler']
+    ranges = [prepared['month_ranges'][month] for month in train_months if month in prepared['month_ranges']]
+    return RunningMinMaxScaler(np.fmin.reduce([low for low, _ in ranges]), np.fmax.reduce([high for _, high in ranges]))
+
+
+def _run_fold(fold, train_months, test_month, paths, month_rows, gases, data_min, data_max, n_steps, test_hours,
+              intra_op_threads, model_kwargs):
+    configure_threads(intra_op_threads, 1)
+    from air_inference import compile_model
+    from air_metrics import error_metrics
+    from air_models import create_lstm_model
+
+    scaler = RunningMinMaxScaler(data_min, data_max)
+    results = []
+    for station, path in paths.items():
+        rows = month_rows[station]
+        if test_month not in rows or any(month not in rows for month in train_months):
+            continue
+        series = np.load(path, mmap_mode='r')
+        train_start, train_stop = rows[train_months[0]][0], rows[train_months[-1]][1]
+        test_start = rows[test_month][0]
+        test_stop = min(rows[test_month][1], test_start + test_hours)
+
+        train = scaler.transform(series[train_start:train_stop]).astype(np.float32)
+        model = create_lstm_model(train, series.shape[1], n_steps=n_steps, **model_kwargs)
+
+        # Window i predicts row i + n_steps, so the test windows start n_steps rows before the test month
+        first = max(test_start - n_steps, 0)
+        X, y = make_windows(scaler.transform(series[first:test_stop]).astype(np.float32), n_steps)
+        X_test, y_test = np.ascontiguousarray(X), y
+        predictions = np.asarray(compile_model(model, n_steps, series.shape[1])(X_test))
+
+        metrics = error_metrics(scaler.inverse_transform(y_test), scaler.inverse_transform(predictions), axis=0)
+        for column, gas in enumerate(gases[station]):
+            results.append({'fold': fold, 'train_months': '-'.join(train_months), 'test_month': test_month,
+                            'station': station, 'pollutant': gas,
+                            **{name: float(values[column]) for name, values in metrics.items()}})
+    return results
+
+
+# Train and evaluate every fold, one worker process per fold, e.g.
+#   frames = load_backtest_frames(months=('jan', 'feb', 'mar', 'apr', 'may', 'jun'))
+#   results = run_backtest(prepare_backtest(frames), walk_forward_folds(['jan', 'feb', 'mar', 'apr', 'may', 'jun']))
+#   results.groupby(['test_month', 'pollutant'])[['MAE', 'RMSE']].mean()
+# Each fold trains create_lstm_model per station on its train months (model_kwargs are passed on) and
+# scores the first `test_hours` of the test month in original units. Returns one row per fold x station x pollutant.
+def run_backtest(prepared, folds, n_steps=24, test_hours=192, max_workers=None, threads_per_worker=None,
+                 **model_kwargs):
+    max_workers, threads_per_worker = worker_threads(len(folds), max_workers, threads_per_worker)
+    model_kwargs.setdefault('verbose', 0)
+    scalers = [fold_scaler(prepared, train_months) for train_months, _ in folds]
+
+    with training_pool(max_workers) as executor:
+        futures = [executor.submit(_run_fold, fold, tuple(train_months), test_month, prepared['paths'],
+                                   prepared['month_rows'], prepared['gases'], scaler.data_min, scaler.data_max,
+                                   n_steps, test_hours, threads_per_worker, model_kwargs)
+                   for fold, ((train_months, test_month), scaler) in enumerate(zip(folds, scalers))]
+        rows = [row for future in futures for row in future.result()]
+    return pd.DataFrame(rows)
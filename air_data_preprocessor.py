@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-# In[2]:
+# In[ ]:
 
 
 import pandas as pd
@@ -9,29 +9,142 @@ import numpy as np
 import json
 import random
 import os
+import re
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
 
 # ### Read Raw Data
 
-# In[3]:
+# In[ ]:
+
+
+AIR_DATA_DIR = 'data/air_data'
+MONTH_FILES = {
+    'jan': 'ene_mo24.csv', 'feb': 'feb_mo24.csv', 'mar': 'mar_mo24.csv', 'apr': 'abr_mo24.csv',
+    'may': 'may_mo24.csv', 'jun': 'jun_mo24.csv', 'jul': 'jul_mo24.csv', 'aug': 'ago_mo24.csv',
+    'sep': 'sep_mo24.csv', 'oct': 'oct_mo24.csv', 'nov': 'nov_mo24.csv', 'dec': 'dic_mo24.csv'
+}
+
 
+# Read one month of raw data, e.g. read_air_csv('jan')
+def read_air_csv(month, data_dir=AIR_DATA_DIR):
+    return pd.read_csv(f"{data_dir}/{MONTH_FILES[month]}", sep=';')
 
-# Read data from Excel
-air_jan = pd.read_csv('data/air_data/ene_mo24.csv', sep=';')
-air_feb = pd.read_csv('data/air_data/feb_mo24.csv',sep=';')
-air_mar = pd.read_csv('data/air_data/mar_mo24.csv',sep=';')
-air_apr = pd.read_csv('data/air_data/abr_mo24.csv',sep=';')
 
+# ### Stage Cache
+# - every preprocessing stage keyed by the content hash of its inputs plus its parameters
+# - unchanged stages are skipped, a corrected or re-published CSV only recomputes what depends on it
 
 # In[ ]:
 
 
-air_jan["PUNTO_MUESTREO"].unique()
+STAGE_CACHE_DIR = 'data_cache'
+# Part of every key: bump it after changing the code of a stage to invalidate what it cached
+STAGE_CACHE_VERSION = 2
+
+
+# sha256 of a file's bytes, hashed once per process as long as its size and mtime do not change
+@functools.lru_cache(maxsize=None)
+def _file_digest(path, size, mtime_ns):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as data_file:
+        for block in iter(lambda: data_file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_digest(path):
+    stat = os.stat(path)
+    return _file_digest(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+# Key of a stage run, e.g. stage_key('reshape', files=['data/air_data/ene_mo24.csv']).
+# files are hashed by content; upstream takes the keys of the stages this one is derived from,
+# so a changed CSV changes the key of every stage downstream of it. params must be JSON-serializable.
+def stage_key(stage, files=(), upstream=(), **params):
+    description = json.dumps({'stage': stage, 'version': STAGE_CACHE_VERSION,
+                              'files': [file_digest(path) for path in files],
+                              'upstream': list(upstream), 'params': params}, sort_keys=True, default=str)
+    return f"{stage}-{hashlib.sha256(description.encode()).hexdigest()[:24]}"
+
+
+# Results of stage runs under `root`, by key:
+#   value(key, compute) - the result itself is pickled (reshaped, aligned or scaled frames)
+#   files(key, compute) - compute writes files elsewhere and returns their paths (NGSI-LD JSON, Arrow);
+#                         a manifest records them and the run is skipped while they are there untouched
+# compute is only called on a miss; hits and misses are counted per instance.
+class StageCache:
+    def __init__(self, root=STAGE_CACHE_DIR):
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key, suffix):
+        return os.path.join(self.root, key.split('-')[0], key + suffix)
+
+    def _write(self, path, write):
+        # Write to a temporary name and rename, so an interrupted run never leaves a truncated entry
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f"{path}.partial{os.getpid()}"
+        write(partial)
+        os.replace(partial, path)
+
+    def _manifest_valid(self, path):
+        if not os.path.exists(path):
+            return False
+        with open(path, 'r') as manifest_file:
+            outputs = json.load(manifest_file)
+        for output, (size, mtime_ns) in outputs.items():
+            if not os.path.exists(output):
+                return False
+            stat = os.stat(output)
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                return False
+        return True
+
+    def has(self, key):
+        return os.path.exists(self._path(key, '.pkl')) or self._manifest_valid(self._path(key, '.json'))
+
+    def value(self, key, compute):
+        path = self._path(key, '.pkl')
+        if os.path.exists(path):
+            self.hits += 1
+            return pd.read_pickle(path)
+        self.misses += 1
+        result = compute()
+        self._write(path, lambda partial: pd.to_pickle(result, partial))
+        return result
+
+    def files(self, key, compute):
+        path = self._path(key, '.json')
+        if self._manifest_valid(path):
+            self.hits += 1
+            with open(path, 'r') as manifest_file:
+                return list(json.load(manifest_file))
+        self.misses += 1
+        outputs = list(compute())
+        manifest = {output: [os.stat(output).st_size, os.stat(output).st_mtime_ns] for output in outputs}
+
+        def write(partial):
+            with open(partial, 'w') as manifest_file:
+                json.dump(manifest, manifest_file, indent=4)
+        self._write(path, write)
+        return outputs
+
+    def __repr__(self):
+        return f"StageCache({self.root!r}, {self.hits} hits, {self.misses} misses)"
+
+
+# Key of reshape_air_quality_data over one month's CSV, the root of every other stage
+def reshape_key(month, data_dir=AIR_DATA_DIR):
+    return stage_key('reshape', files=[f"{data_dir}/{MONTH_FILES[month]}"])
 
 
 # ### Function to convert to the format of |Date|Station|Time|Data|
 
-# In[4]:
+# In[ ]:
 
 
 def reshape_air_quality_data(df):
@@ -67,74 +180,131 @@ def reshape_air_quality_data(df):
 # In[ ]:
 
 
-air_jan_formatted = reshape_air_quality_data(air_jan)
-air_feb_formatted = reshape_air_quality_data(air_feb)
-air_mar_formatted = reshape_air_quality_data(air_mar)
-air_apr_formatted = reshape_air_quality_data(air_apr)
-air_jan_formatted
+# Streaming version of reshape_air_quality_data for large archives.
+# Reads the raw CSVs `chunksize` rows at a time and yields each chunk already melted to
+# |Date|Station|Time|Data| with compact dtypes: categorical Station, int8 hour (1-24)
+# in Time and float32 Data. Peak memory is bounded by the chunk, not the archive.
+# Rows keep the file order (station by station, day by day), they are not re-sorted.
+def iter_air_quality_chunks(csv_paths, chunksize=100_000, stations=None):
+    if isinstance(csv_paths, str):
+        csv_paths = [csv_paths]
+
+    hour_columns = [f"H{i:02d}" for i in range(1, 25)]  # Columns H01 to H24
+    dtypes = {"ANO": "int16", "MES": "int8", "DIA": "int8", "PUNTO_MUESTREO": "str"}
+    dtypes.update({column: "float32" for column in hour_columns})
+
+    # Fixed categories keep chunks concatenable without falling back to object dtype
+    station_dtype = pd.CategoricalDtype(stations) if stations is not None else "category"
+    hours = np.arange(1, 25, dtype=np.int8)
+
+    for csv_path in csv_paths:
+        reader = pd.read_csv(csv_path, sep=';', usecols=list(dtypes), dtype=dtypes, chunksize=chunksize)
+        for chunk in reader:
+            if stations is not None:
+                chunk = chunk[chunk["PUNTO_MUESTREO"].isin(stations)]
+            if chunk.empty:
+                continue
+
+            dates = pd.to_datetime(pd.DataFrame({"year": chunk["ANO"], "month": chunk["MES"], "day": chunk["DIA"]}))
+
+            # Row-major ravel of the H01..H24 block gives the melted order directly
+            values = chunk[hour_columns].to_numpy(dtype=np.float32)
+            n_rows = len(chunk)
+            yield pd.DataFrame({
+                "Date": np.repeat(dates.to_numpy(), 24),
+                "Station": pd.Categorical(np.repeat(chunk["PUNTO_MUESTREO"].to_numpy(), 24), dtype=station_dtype),
+                "Time": np.tile(hours, n_rows),
+                "Data": values.ravel(),
+            })
+
+
+# ### Function to Convert the Data Frame to the NGSI-LD Data Format
+# - convert data frame to ngsild format
+# - save as json
 
+# In[ ]:
 
-# In[14]:
 
+def json_path(month, station, root="data_air_json"):
+    # station is the full sampling point code, e.g. 28079004_7_8
+    return f"{root}/{month}/air_quality_observed_{station}_{month}.json"
 
-air_apr_formatted
 
+# Data column for serialising. float32 values (iter_air_quality_chunks) are widened to float64 through
+# their shortest decimal form, so 64.1 stays 64.1 instead of becoming 64.0999984741211 as with a plain cast.
+def observation_values(data):
+    values = np.asarray(data)
+    if values.dtype == np.float32:
+        return values.astype(str).astype(np.float64)
+    return values
 
-# In[19]:
 
+def build_observed_at(dates, times):
+    # Build "YYYY-MM-DDTHH:MM:00Z" strings for whole columns at once.
+    # Only a handful of distinct days/hours exist per month, so format the uniques and broadcast.
+    # times are "HH:00" strings (reshape_air_quality_data) or integer hours 1-24 (iter_air_quality_chunks).
+    times = pd.Series(times)
+    if pd.api.types.is_integer_dtype(times):
+        hours = times.to_numpy().astype(np.int64)
+        if len(hours) and (hours.min() < 0 or hours.max() > 24):
+            raise ValueError(f"Hours must be between 0 and 24, got {hours.min()}..{hours.max()}")
+        times = np.array([f"{hour:02d}:00" for hour in range(25)], dtype=object)[hours]
+    else:
+        times = np.array(times.astype(str).str.strip(), dtype=object)
 
-air_apr_formatted["Station"].unique().size
+    # "24:00" becomes "00:00" of the next day
+    rollover = times == "24:00"
+    times[rollover] = "00:00"
+    dates = pd.to_datetime(pd.Series(dates)).to_numpy() + rollover * np.timedelta64(1, 'D')
 
+    date_codes, date_uniques = pd.factorize(dates)
+    date_strs = pd.DatetimeIndex(date_uniques).strftime('%Y-%m-%d').to_numpy(dtype=object)
 
-# ### Function to Convert the Data Frame to the NGSI-LD Data Format
-# - convert data frame to ngsild format
-# - save as json
+    return date_strs[date_codes] + "T" + times + ":00Z"
 
-# In[60]:
 
+def convert_to_ngsild(df, month, gas="nox", writer="station", indent=4, output_dir="data_air_json"):
+    # writer:
+    #   "station"    - one file per station holding only that station's entity
+    #   "ndjson"     - one file per month, one entity per line
+    #   "cumulative" - old layout: station N's file holds stations 1..N (quadratic bytes written)
+    #   None         - no files, only the returned entities
+    # indent=None writes compact JSON
+    if writer not in ("station", "ndjson", "cumulative", None):
+        raise ValueError(f"Unknown writer '{writer}', expected 'station', 'ndjson', 'cumulative' or None")
 
-def convert_to_ngsild(df, month):
     # Create a list to store the entities
     entities = []
-    
-    # Helper function to generate a random 10-digit datasetId
-    def generate_dataset_id():
-        return f"urn:ngsi-ld:{random.randint(1000000000, 9999999999)}"
+
+    # Helper function to generate random 10-digit datasetIds in bulk
+    # (draws from `random` in the same order as one call per observation)
+    def generate_dataset_ids(n):
+        randint = random.randint
+        return [f"urn:ngsi-ld:{randint(1000000000, 9999999999)}" for _ in range(n)]
+
+    # Build every observedAt string and pull the values out in one pass
+    observed_at = build_observed_at(df['Date'], df['Time'])
+    values = observation_values(df['Data'])
+    station_rows = df.groupby('Station', sort=False).indices
 
     # Iterate over each unique station in the DataFrame
     for station in df['Station'].unique():
-        station_df = df[df['Station'] == station]
+        rows = station_rows[station]
 
         # Extract the first part of the station code
         station_base = station.split("_")[0]  # Extracts '28079004' from '28079004_12_8'
 
         # Create flow data 
-        data = []
-        for _, row in station_df.iterrows():
-            # Handle the Date and Time formatting
-            if isinstance(row['Date'], pd.Timestamp):
-                date_value = row['Date']
-            else:
-                date_value = pd.to_datetime(row['Date'])
-
-            time_str = row['Time'].strip()
-
-            # Check if time is "24:00" and convert to "00:00" of the next day
-            if time_str == "24:00":
-                date_value += pd.Timedelta(days=1)
-                time_str = "00:00"
-
-            # Ensure date is in 'YYYY-MM-DD' format
-            date_str = date_value.strftime('%Y-%m-%d')
-
-            observed_at = f"{date_str}T{time_str}:00Z"  # Combine date and time correctly
-            data.append({
+        data = [
+            {
                 "type": "Property",
-                "observedAt": observed_at,
-                "datasetId": generate_dataset_id(),  # Add the random datasetId
-                "value": row['Data'],
+                "observedAt": observed,
+                "datasetId": dataset_id,  # Add the random datasetId
+                "value": value,
                 "unitCode": "GQ"
-            })
+            }
+            for observed, dataset_id, value in zip(observed_at[rows], generate_dataset_ids(len(rows)), values[rows].tolist())
+        ]
 
         # Create an entity using station_base
         entity_1 = {
@@ -148,7 +318,7 @@ def convert_to_ngsild(df, month):
                 "type": "Property",
                 "value": "PT1H"
             },
-            "nox": data,
+            gas: data,
             "@context": [
                 "https://easy-global-market.github.io/c2jn-data-models/jsonld-contexts/c2jn-compound.jsonld"
             ]
@@ -157,770 +327,729 @@ def convert_to_ngsild(df, month):
         entities.append(entity_1)
 
         # Save the JSON output to a file
-        with open(f"data_air_json/{month}/air_quality_observed_{station}_{month}.json", 'w') as json_file:
-            json.dump(entities, json_file, indent=4)
+        if writer == "station":
+            with open(json_path(month, station, output_dir), 'w') as json_file:
+                json.dump([entity_1], json_file, indent=indent)
+        elif writer == "cumulative":
+            with open(json_path(month, station, output_dir), 'w') as json_file:
+                json.dump(entities, json_file, indent=indent)
+
+    # Whole month in a single NDJSON file
+    if writer == "ndjson":
+        with open(f"{output_dir}/{month}/air_quality_observed_{gas}_{month}.ndjson", 'w') as ndjson_file:
+            for entity in entities:
+                ndjson_file.write(json.dumps(entity) + "\n")
 
     return entities
 
 
-# In[ ]:
-
-
-air_jan_formatted["Station"].unique()
+# Files convert_to_ngsild writes for `df`
+def ngsild_paths(df, month, gas="nox", writer="station", output_dir="data_air_json"):
+    if writer is None:
+        return []
+    if writer == "ndjson":
+        return [f"{output_dir}/{month}/air_quality_observed_{gas}_{month}.ndjson"]
+    return [json_path(month, station, output_dir) for station in df['Station'].unique()]
 
 
-# In[8]:
-
-
-stations_so2    = ['28079008_1_38', '28079035_1_38', '28079036_1_38']
-stations_co     = ['28079004_6_48', '28079008_6_48', '28079035_6_48', '28079056_6_48']
-
-stations_tol    = ['28079008_20_59', '28079011_20_59', '28079018_20_59', '28079024_20_59', '28079038_20_59', '28079055_20_59']
-stations_ben    = ['28079008_30_59', '28079011_30_59', '28079018_30_59', '28079024_30_59', '28079038_30_59', '28079055_30_59']
-stations_ebe    = ['28079008_35_59', '28079011_35_59', '28079018_35_59', '28079024_35_59', '28079038_35_59', '28079055_35_59']
-
-stations_pm25   = ['28079008_9_47', '28079024_9_47', '28079038_9_47', '28079047_9_47', '28079048_9_47', '28079050_9_47', '28079056_9_47', '28079057_9_47']
-stations_pm10 = ['28079008_10_47', '28079018_10_47', '28079024_10_47', '28079036_10_47', '28079038_10_47', '28079040_10_47', '28079047_10_47', '28079048_10_47',
-                 '28079050_10_47', '28079055_10_47', '28079056_10_47', '28079057_10_47', '28079060_10_47']
-stations_o3 = ['28079008_14_6', '28079016_14_6', '28079017_14_6', '28079018_14_6', '28079024_14_6', '28079027_14_6', '28079035_14_6', '28079039_14_6',
-               '28079049_14_6', '28079054_14_6', '28079058_14_6', '28079059_14_6', '28079060_14_6']
-
-stations_no     = ['28079004_7_8', '28079008_7_8', '28079011_7_8', '28079016_7_8', '28079017_7_8', '28079018_7_8', '28079024_7_8', '28079027_7_8' , 
-                   '28079035_7_8', '28079036_7_8', '28079038_7_8', '28079039_7_8', '28079040_7_8', '28079047_7_8', '28079048_7_8', '28079049_7_8' ,
-                   '28079050_7_8', '28079054_7_8', '28079055_7_8', '28079056_7_8', '28079057_7_8', '28079058_7_8', '28079059_7_8', '28079060_7_8' ]
-stations_no2    = ['28079004_8_8', '28079008_8_8', '28079011_8_8', '28079016_8_8', '28079017_8_8', '28079018_8_8', '28079024_8_8', '28079027_8_8', 
-                   '28079035_8_8', '28079036_8_8', '28079038_8_8', '28079039_8_8', '28079040_8_8', '28079047_8_8', '28079048_8_8', '28079049_8_8', 
-                   '28079050_8_8', '28079054_8_8', '28079055_8_8', '28079056_8_8', '28079057_8_8', '28079058_8_8', '28079059_8_8', '28079060_8_8']
-stations_nox    = ['28079004_12_8', '28079008_12_8', '28079011_12_8', '28079016_12_8', '28079017_12_8', '28079018_12_8', '28079024_12_8', '28079027_12_8',
-                   '28079035_12_8', '28079036_12_8', '28079038_12_8', '28079039_12_8', '28079040_12_8', '28079047_12_8', '28079048_12_8', '28079049_12_8',
-                   '28079050_12_8', '28079054_12_8', '28079055_12_8', '28079056_12_8', '28079057_12_8', '28079058_12_8', '28079059_12_8', '28079060_12_8']
-
-
-# ### Function to find Stations and there Gases 
+# ### Station Catalog
+# - stations and their gases, read from the sampling point codes in the CSV
 
 # In[ ]:
 
 
-# Create a dictionary to map gases to their respective stations
-gas_to_stations = {
-    'SO2': stations_so2,
-    'CO': stations_co,
-    'TOL': stations_tol,
-    'BEN': stations_ben,
-    'EBE': stations_ebe,
-    'PM2.5': stations_pm25,
-    'PM10': stations_pm10,
-    'O3': stations_o3,
-    'NO': stations_no,
-    'NO2': stations_no2,
-    'NOX': stations_nox
+# Madrid magnitude codes (second field of PUNTO_MUESTREO, e.g. 28079004_7_8 -> 7)
+GAS_MAGNITUDES = {
+    'so2': 1, 'co': 6, 'no': 7, 'no2': 8, 'pm25': 9, 'pm10': 10,
+    'nox': 12, 'o3': 14, 'tol': 20, 'ben': 30, 'ebe': 35
 }
-
-# Create a dictionary to map each station to the gases it measures
-station_to_gases = {}
-
-# Populate the station_to_gases dictionary
-for gas, stations in gas_to_stations.items():
-    for station in stations:
-        # Extract the station name (first part of the string)
-        station_name = station.split('_')[0]
-        if station_name not in station_to_gases:
-            station_to_gases[station_name] = set()  # Use a set to avoid duplicate gases
-        station_to_gases[station_name].add(gas)
-
-# Convert sets to lists for better readability
-station_to_gases = {station: sorted(gases) for station, gases in station_to_gases.items()}
-
-# Print the result
-for station, gases in station_to_gases.items():
-    print(f"{station}: {', '.join(gases)}")
+MAGNITUDE_GASES = {magnitude: gas for gas, magnitude in GAS_MAGNITUDES.items()}
 
 
-# #### Selected Stations
-# - 28079008
-# - 28079018
-# - 28079024
-# - 28079060
+# Which station measures which gas, built from the sampling point codes in the raw CSVs
+# (e.g. 28079004_7_8 -> station 28079004, magnitude 7 = no) instead of hand-written lists
+class StationCatalog:
+    def __init__(self, codes):
+        # (station, gas) -> full sampling point code
+        self.codes = {}
+        for code in sorted(set(codes)):
+            station, magnitude = code.split('_')[:2]
+            gas = MAGNITUDE_GASES.get(int(magnitude), f"mag{magnitude}")
+            self.codes[(station, gas)] = code
 
-# ### Jan
+    @classmethod
+    def from_csv(cls, csv_paths):
+        if isinstance(csv_paths, str):
+            csv_paths = [csv_paths]
+        codes = set()
+        for csv_path in csv_paths:
+            codes.update(pd.read_csv(csv_path, sep=';', usecols=['PUNTO_MUESTREO'])['PUNTO_MUESTREO'])
+        return cls(codes)
 
-# In[55]:
+    @property
+    def stations(self):
+        return sorted({station for station, _ in self.codes})
 
+    @property
+    def gases(self):
+        return sorted({gas for _, gas in self.codes})
 
-air_jan_formatted_so2 = air_jan_formatted[air_jan_formatted["Station"].isin(stations_so2)]
-air_jan_formatted_co = air_jan_formatted[air_jan_formatted["Station"].isin(stations_co)]
-air_jan_formatted_tol = air_jan_formatted[air_jan_formatted["Station"].isin(stations_tol)]
-air_jan_formatted_ben = air_jan_formatted[air_jan_formatted["Station"].isin(stations_ben)]
-air_jan_formatted_ebe = air_jan_formatted[air_jan_formatted["Station"].isin(stations_ebe)]
-air_jan_formatted_pm25 = air_jan_formatted[air_jan_formatted["Station"].isin(stations_pm25)]
-air_jan_formatted_pm10 = air_jan_formatted[air_jan_formatted["Station"].isin(stations_pm10)]
-air_jan_formatted_o3 = air_jan_formatted[air_jan_formatted["Station"].isin(stations_o3)]
-air_jan_formatted_no = air_jan_formatted[air_jan_formatted["Station"].isin(stations_no)]
-air_jan_formatted_no2 = air_jan_formatted[air_jan_formatted["Station"].isin(stations_no2)]
-air_jan_formatted_nox = air_jan_formatted[air_jan_formatted["Station"].isin(stations_nox)]
+    def code(self, station, gas):
+        return self.codes[(station.split('_')[0], gas)]
 
+    def has(self, station, gas):
+        return (station.split('_')[0], gas) in self.codes
 
-# ### Feb
+    def stations_for(self, gas):
+        # Sampling point codes measuring `gas`, like the old stations_<gas> lists
+        return [code for (_, code_gas), code in sorted(self.codes.items()) if code_gas == gas]
 
-# In[11]:
+    def gases_for(self, station):
+        station = station.split('_')[0]
+        return sorted(gas for code_station, gas in self.codes if code_station == station)
 
+    @property
+    def gas_to_stations(self):
+        return {gas: self.stations_for(gas) for gas in self.gases}
 
-air_feb_formatted_so2 = air_feb_formatted[air_feb_formatted["Station"].isin(stations_so2)]
-air_feb_formatted_co = air_feb_formatted[air_feb_formatted["Station"].isin(stations_co)]
-air_feb_formatted_tol = air_feb_formatted[air_feb_formatted["Station"].isin(stations_tol)]
-air_feb_formatted_ben = air_feb_formatted[air_feb_formatted["Station"].isin(stations_ben)]
-air_feb_formatted_ebe = air_feb_formatted[air_feb_formatted["Station"].isin(stations_ebe)]
-air_feb_formatted_pm25 = air_feb_formatted[air_feb_formatted["Station"].isin(stations_pm25)]
-air_feb_formatted_pm10 = air_feb_formatted[air_feb_formatted["Station"].isin(stations_pm10)]
-air_feb_formatted_o3 = air_feb_formatted[air_feb_formatted["Station"].isin(stations_o3)]
-air_feb_formatted_no = air_feb_formatted[air_feb_formatted["Station"].isin(stations_no)]
-air_feb_formatted_no2 = air_feb_formatted[air_feb_formatted["Station"].isin(stations_no2)]
-air_feb_formatted_nox = air_feb_formatted[air_feb_formatted["Station"].isin(stations_nox)]
+    @property
+    def station_to_gases(self):
+        return {station: self.gases_for(station) for station in self.stations}
 
+    def select(self, df, gas):
+        # Rows of a reshaped frame for one gas, like air_<month>_formatted_<gas>
+        return df[df['Station'].isin(self.stations_for(gas))]
 
-# ### Mar
+    def __repr__(self):
+        return f"StationCatalog({len(self.stations)} stations, {len(self.codes)} series)"
 
-# In[12]:
 
+# ### Function to Read JSON Data
 
-air_mar_formatted_so2 = air_mar_formatted[air_mar_formatted["Station"].isin(stations_so2)]
-air_mar_formatted_co = air_mar_formatted[air_mar_formatted["Station"].isin(stations_co)]
-air_mar_formatted_tol = air_mar_formatted[air_mar_formatted["Station"].isin(stations_tol)]
-air_mar_formatted_ben = air_mar_formatted[air_mar_formatted["Station"].isin(stations_ben)]
-air_mar_formatted_ebe = air_mar_formatted[air_mar_formatted["Station"].isin(stations_ebe)]
-air_mar_formatted_pm25 = air_mar_formatted[air_mar_formatted["Station"].isin(stations_pm25)]
-air_mar_formatted_pm10 = air_mar_formatted[air_mar_formatted["Station"].isin(stations_pm10)]
-air_mar_formatted_o3 = air_mar_formatted[air_mar_formatted["Station"].isin(stations_o3)]
-air_mar_formatted_no = air_mar_formatted[air_mar_formatted["Station"].isin(stations_no)]
-air_mar_formatted_no2 = air_mar_formatted[air_mar_formatted["Station"].isin(stations_no2)]
-air_mar_formatted_nox = air_mar_formatted[air_mar_formatted["Station"].isin(stations_nox)]
-
+# In[ ]:
 
-# ### Apr
 
-# In[13]:
+# Fastest JSON decoder available: orjson, then simdjson, then the standard library.
+# Both accelerated decoders reject NaN literals, which json.dump writes for missing values,
+# so such files fall back to json.
+def _json_decoder():
+    try:
+        import orjson
 
+        return orjson.loads, orjson.JSONDecodeError
+    except ImportError:
+        pass
+    try:
+        import simdjson
 
-air_apr_formatted_so2 = air_apr_formatted[air_apr_formatted["Station"].isin(stations_so2)]
-air_apr_formatted_co = air_apr_formatted[air_apr_formatted["Station"].isin(stations_co)]
-air_apr_formatted_tol = air_apr_formatted[air_apr_formatted["Station"].isin(stations_tol)]
-air_apr_formatted_ben = air_apr_formatted[air_apr_formatted["Station"].isin(stations_ben)]
-air_apr_formatted_ebe = air_apr_formatted[air_apr_formatted["Station"].isin(stations_ebe)]
-air_apr_formatted_pm25 = air_apr_formatted[air_apr_formatted["Station"].isin(stations_pm25)]
-air_apr_formatted_pm10 = air_apr_formatted[air_apr_formatted["Station"].isin(stations_pm10)]
-air_apr_formatted_o3 = air_apr_formatted[air_apr_formatted["Station"].isin(stations_o3)]
-air_apr_formatted_no = air_apr_formatted[air_apr_formatted["Station"].isin(stations_no)]
-air_apr_formatted_no2 = air_apr_formatted[air_apr_formatted["Station"].isin(stations_no2)]
-air_apr_formatted_nox = air_apr_formatted[air_apr_formatted["Station"].isin(stations_nox)]
+        return simdjson.loads, ValueError
+    except ImportError:
+        return json.loads, json.JSONDecodeError
 
 
-# In[14]:
+_json_loads, _json_error = _json_decoder()
 
 
-air_apr_formatted_no
+def decode_json(data):
+    try:
+        return _json_loads(data)
+    except _json_error:
+        return json.loads(data)
 
 
-# In[56]:
+# Read the entities of a month NDJSON file, optionally only the one for `station`
+def read_ndjson_entities(ndjson_file_path, station=None):
+    entity_id = None
+    if station is not None:
+        entity_id = f'"urn:ngsi-ld:AirQualityObserved:{station.split("_")[0]}"'.encode()
 
+    entities = []
+    with open(ndjson_file_path, 'rb') as ndjson_file:
+        for line in ndjson_file:
+            # Skip decoding lines of other stations
+            if entity_id is None or entity_id in line:
+                entities.append(decode_json(line))
+    return entities
 
-air_jan_formatted_co
 
+# Vectorized parser for the fixed "YYYY-MM-DDTHH:MM:SSZ" strings written by build_observed_at:
+# the digits are read straight from the bytes, so no per-string format inference.
+# Anything else goes through pd.to_datetime. Returns UTC timestamps in ns, like read_air_columnar.
+def parse_observed_at(observed_at):
+    raw = np.asarray(observed_at, dtype='S')
+    fixed = raw.dtype.itemsize == 20 and len(raw) > 0
+    if fixed:
+        chars = raw.view(np.uint8).reshape(-1, 20)
+        fixed = (chars[:, [4, 7, 10, 13, 16, 19]] == np.frombuffer(b'--T::Z', dtype=np.uint8)).all()
+    if not fixed:
+        return pd.to_datetime(pd.Series(observed_at, dtype=object), utc=True).dt.as_unit('ns')
+
+    digits = chars.astype(np.int64) - ord('0')
+    number = lambda start, width: sum(digits[:, start + i] * 10 ** (width - 1 - i) for i in range(width))
+    months = (number(0, 4) - 1970) * 12 + number(5, 2) - 1
+    timestamps = (months.astype('datetime64[M]').astype('datetime64[D]') + (number(8, 2) - 1)).astype('datetime64[s]')
+    timestamps = timestamps + number(11, 2) * 3600 + number(14, 2) * 60 + number(17, 2)
+    return pd.Series(pd.DatetimeIndex(timestamps.astype('datetime64[ns]')).tz_localize('UTC'))
+
+
+# Read one gas series from an NGSI-LD file as (observedAt, value), sorted by observedAt.
+# Only the `gas` property is pulled out, into typed arrays (UTC datetime64 / float64, null -> NaN).
+# With `station` the entity of that station is used, otherwise the last one in the file
+# (the cumulative layout holds stations 1..N and its own station last).
+def read_air_data(json_file_path, gas, station=None):
+    if json_file_path.endswith(".ndjson"):
+        data = read_ndjson_entities(json_file_path, station)
+    else:
+        with open(json_file_path, 'rb') as json_file:
+            data = decode_json(json_file.read())
+
+    flow_data = []
+    if station is not None:
+        entity_id = f"urn:ngsi-ld:AirQualityObserved:{station.split('_')[0]}"
+        data = [entity for entity in data if entity.get('id') == entity_id]
+    if data:
+        flow_data = data[-1].get(gas, [])
+
+    values = np.fromiter((np.nan if item['value'] is None else item['value'] for item in flow_data),
+                         dtype=np.float64, count=len(flow_data))
+    observed_at = parse_observed_at([item['observedAt'] for item in flow_data])
+
+    df = pd.DataFrame({'observedAt': observed_at, 'value': values})
+    if not df['observedAt'].is_monotonic_increasing:
+        df = df.sort_values('observedAt', kind='stable', ignore_index=True)
+    return df
 
-# In[ ]:
 
+# Many files at once on a thread pool (file reads and decoding overlap), in the order of `paths`
+def read_air_files(paths, gas, station=None, max_workers=None):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(functools.partial(read_air_data, gas=gas, station=station), paths))
 
-#convert_to_ngsild(air_jan_formatted_co, "jan")
-#convert_to_ngsild(air_feb_formatted_co, "feb")
-#convert_to_ngsild(air_mar_formatted_co, "mar")
-#convert_to_ngsild(air_apr_formatted_co, "apr")
 
+# ### Columnar Cache (Arrow IPC)
+# - one file per month and magnitude, written straight from `reshape_air_quality_data`
+# - one record batch per station, read back memory-mapped without JSON decoding
 
 # In[ ]:
 
 
-#convert_to_ngsild(air_jan_formatted_o3, "jan")
-#convert_to_ngsild(air_feb_formatted_o3, "feb")
-#convert_to_ngsild(air_mar_formatted_o3, "mar")
-#convert_to_ngsild(air_apr_formatted_o3, "apr")
-
-
-# In[ ]:
+def columnar_path(month, gas, root="data_air_arrow"):
+    return f"{root}/{month}/air_quality_{gas}_{month}.arrow"
 
 
-#convert_to_ngsild(air_jan_formatted_no, "jan")
-#convert_to_ngsild(air_feb_formatted_no, "feb")
-#convert_to_ngsild(air_mar_formatted_no, "mar")
-#convert_to_ngsild(air_apr_formatted_no, "apr")
+def write_air_columnar(df, month, root="data_air_arrow"):
+    # Write the output of reshape_air_quality_data (or concatenated iter_air_quality_chunks)
+    # to one Arrow IPC file per magnitude, one record batch per station
+    import pyarrow as pa
 
+    stations = df['Station'].astype(str)
+    magnitudes = stations.str.split('_').str[1].astype(int)
 
-# In[ ]:
+    # Time is "HH:00" from reshape_air_quality_data or an int hour from the chunked reader
+    hours = df['Time']
+    if not pd.api.types.is_integer_dtype(hours):
+        hours = hours.astype(str).str.strip().str[:2].astype(int)
+    observed_at = pd.DatetimeIndex(
+        pd.to_datetime(df['Date']).to_numpy() + hours.to_numpy().astype('timedelta64[h]')).tz_localize('UTC')
 
+    frame = pd.DataFrame({
+        'station': stations.str.split('_').str[0].to_numpy(),
+        'magnitude': magnitudes.to_numpy(),
+        'observedAt': observed_at,
+        'value': observation_values(df['Data']).astype(np.float64),
+    }).sort_values(['magnitude', 'station', 'observedAt'], kind='stable')
 
-#convert_to_ngsild(air_jan_formatted_no2, "jan")
-#convert_to_ngsild(air_feb_formatted_no2, "feb")
-#convert_to_ngsild(air_mar_formatted_no2, "mar")
-#convert_to_ngsild(air_apr_formatted_no2, "apr")
+    schema = pa.schema([('observedAt', pa.timestamp('ns', tz='UTC')), ('value', pa.float64())])
+    os.makedirs(f"{root}/{month}", exist_ok=True)
 
+    paths = []
+    for magnitude, magnitude_df in frame.groupby('magnitude', sort=True):
+        gas = MAGNITUDE_GASES.get(magnitude, f"mag{magnitude}")
+        station_groups = list(magnitude_df.groupby('station', sort=True))
 
-# In[62]:
+        # Batch order is recorded in the schema metadata so the loader can jump straight to a station
+        file_schema = schema.with_metadata({'stations': json.dumps([station for station, _ in station_groups])})
+        path = columnar_path(month, gas, root)
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, file_schema) as writer:
+            for _, station_df in station_groups:
+                writer.write_batch(pa.RecordBatch.from_pandas(
+                    station_df[['observedAt', 'value']], schema=file_schema, preserve_index=False))
+        paths.append(path)
 
+    return paths
 
-#convert_to_ngsild(air_jan_formatted_nox, "jan")
-#convert_to_ngsild(air_feb_formatted_nox, "feb")
-#convert_to_ngsild(air_mar_formatted_nox, "mar")
-#convert_to_ngsild(air_apr_formatted_nox, "apr")
 
+def read_air_columnar(month, gas, station, root="data_air_arrow"):
+    # Per-station frame (observedAt, value) like read_air_data, read from the memory-mapped cache
+    import pyarrow as pa
 
-# ### Function to Read JSON Data
-
-# In[53]:
-
-
-# Read traffic flow data
-def read_air_data(json_file_path, gas):
-    # Step 1: Read the JSON data from the file
-    with open(json_file_path, 'r') as json_file:
-        data = json.load(json_file)
-
-    # Step 2: Find the entity data for the specified direction
-    flow_data = None
-    for entity in data:
-        flow_data = entity.get(gas,[])
-
-    # Step 3: Convert the flow data to a pandas DataFrame
-    df = pd.DataFrame(flow_data)
-    df['observedAt'] = pd.to_datetime(df['observedAt'])
-    df = df.sort_values('observedAt')
+    station_base = station.split("_")[0]
+    with pa.memory_map(columnar_path(month, gas, root), 'r') as source:
+        reader = pa.ipc.open_file(source)
+        stations = json.loads(reader.schema.metadata[b'stations'])
+        if station_base not in stations:
+            raise KeyError(f"Station {station_base} has no {gas} data for {month} in {root}")
+        batch = reader.get_batch(stations.index(station_base))
+        df = batch.to_pandas()
 
     return df
 
 
-# In[ ]:
-
-
-#print data read code
-for e in range(1, 61):  # Loop for entity numbers 1 to 60
-    for d in range(1, 3):  # Loop for directions 1 and 2
-        print(f'df_mar_e{e:02}_dir_{d}_train = read_air_data("data_air_json/jan/urn_ngsi-ld_TrafficFlowObserved_ES{e:02}_jan.json")')
-
-
-# ### NO
-
-# In[ ]:
-
-
-for stations in stations_no:
-    print(f'df_mar_{stations.split("_")[0]}_no_train = read_air_data("data_air_json/mar/air_quality_observed_{stations}_mar.json", gas="no")')
-
-
-# In[45]:
-
-
-df_jan_28079004_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079004_7_8_jan.json", gas="no")
-df_jan_28079008_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079008_7_8_jan.json", gas="no")
-df_jan_28079011_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079011_7_8_jan.json", gas="no")
-df_jan_28079016_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079016_7_8_jan.json", gas="no")
-df_jan_28079017_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079017_7_8_jan.json", gas="no")
-df_jan_28079018_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079018_7_8_jan.json", gas="no")
-df_jan_28079024_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079024_7_8_jan.json", gas="no")
-df_jan_28079027_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079027_7_8_jan.json", gas="no")
-df_jan_28079035_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079035_7_8_jan.json", gas="no")
-df_jan_28079036_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079036_7_8_jan.json", gas="no")
-df_jan_28079038_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079038_7_8_jan.json", gas="no")
-df_jan_28079039_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079039_7_8_jan.json", gas="no")
-df_jan_28079040_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079040_7_8_jan.json", gas="no")
-df_jan_28079047_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079047_7_8_jan.json", gas="no")
-df_jan_28079048_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079048_7_8_jan.json", gas="no")
-df_jan_28079049_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079049_7_8_jan.json", gas="no")
-df_jan_28079050_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079050_7_8_jan.json", gas="no")
-df_jan_28079054_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079054_7_8_jan.json", gas="no")
-df_jan_28079055_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079055_7_8_jan.json", gas="no")
-df_jan_28079056_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079056_7_8_jan.json", gas="no")
-df_jan_28079057_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079057_7_8_jan.json", gas="no")
-df_jan_28079058_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079058_7_8_jan.json", gas="no")
-df_jan_28079059_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079059_7_8_jan.json", gas="no")
-df_jan_28079060_no_train = read_air_data("data_air_json/jan/air_quality_observed_28079060_7_8_jan.json", gas="no")
-
-
-df_feb_28079004_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079004_7_8_feb.json", gas="no")
-df_feb_28079008_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079008_7_8_feb.json", gas="no")
-df_feb_28079011_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079011_7_8_feb.json", gas="no")
-df_feb_28079016_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079016_7_8_feb.json", gas="no")
-df_feb_28079017_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079017_7_8_feb.json", gas="no")
-df_feb_28079018_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079018_7_8_feb.json", gas="no")
-df_feb_28079024_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079024_7_8_feb.json", gas="no")
-df_feb_28079027_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079027_7_8_feb.json", gas="no")
-df_feb_28079035_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079035_7_8_feb.json", gas="no")
-df_feb_28079036_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079036_7_8_feb.json", gas="no")
-df_feb_28079038_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079038_7_8_feb.json", gas="no")
-df_feb_28079039_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079039_7_8_feb.json", gas="no")
-df_feb_28079040_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079040_7_8_feb.json", gas="no")
-df_feb_28079047_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079047_7_8_feb.json", gas="no")
-df_feb_28079048_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079048_7_8_feb.json", gas="no")
-df_feb_28079049_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079049_7_8_feb.json", gas="no")
-df_feb_28079050_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079050_7_8_feb.json", gas="no")
-df_feb_28079054_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079054_7_8_feb.json", gas="no")
-df_feb_28079055_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079055_7_8_feb.json", gas="no")
-df_feb_28079056_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079056_7_8_feb.json", gas="no")
-df_feb_28079057_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079057_7_8_feb.json", gas="no")
-df_feb_28079058_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079058_7_8_feb.json", gas="no")
-df_feb_28079059_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079059_7_8_feb.json", gas="no")
-df_feb_28079060_no_train = read_air_data("data_air_json/feb/air_quality_observed_28079060_7_8_feb.json", gas="no")
-
-df_mar_28079004_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079004_7_8_mar.json", gas="no")
-df_mar_28079008_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079008_7_8_mar.json", gas="no")
-df_mar_28079011_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079011_7_8_mar.json", gas="no")
-df_mar_28079016_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079016_7_8_mar.json", gas="no")
-df_mar_28079017_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079017_7_8_mar.json", gas="no")
-df_mar_28079018_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079018_7_8_mar.json", gas="no")
-df_mar_28079024_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079024_7_8_mar.json", gas="no")
-df_mar_28079027_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079027_7_8_mar.json", gas="no")
-df_mar_28079035_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079035_7_8_mar.json", gas="no")
-df_mar_28079036_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079036_7_8_mar.json", gas="no")
-df_mar_28079038_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079038_7_8_mar.json", gas="no")
-df_mar_28079039_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079039_7_8_mar.json", gas="no")
-df_mar_28079040_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079040_7_8_mar.json", gas="no")
-df_mar_28079047_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079047_7_8_mar.json", gas="no")
-df_mar_28079048_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079048_7_8_mar.json", gas="no")
-df_mar_28079049_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079049_7_8_mar.json", gas="no")
-df_mar_28079050_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079050_7_8_mar.json", gas="no")
-df_mar_28079054_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079054_7_8_mar.json", gas="no")
-df_mar_28079055_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079055_7_8_mar.json", gas="no")
-df_mar_28079056_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079056_7_8_mar.json", gas="no")
-df_mar_28079057_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079057_7_8_mar.json", gas="no")
-df_mar_28079058_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079058_7_8_mar.json", gas="no")
-df_mar_28079059_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079059_7_8_mar.json", gas="no")
-df_mar_28079060_no_train = read_air_data("data_air_json/mar/air_quality_observed_28079060_7_8_mar.json", gas="no")
-
-
-# Concat Train Data
-df_28079004_no_train = pd.concat([df_jan_28079004_no_train, df_feb_28079004_no_train, df_mar_28079004_no_train], ignore_index = 'True')
-df_28079016_no_train = pd.concat([df_jan_28079016_no_train, df_feb_28079016_no_train, df_mar_28079016_no_train], ignore_index = 'True')
-df_28079017_no_train = pd.concat([df_jan_28079017_no_train, df_feb_28079017_no_train, df_mar_28079017_no_train], ignore_index = 'True')
-df_28079027_no_train = pd.concat([df_jan_28079027_no_train, df_feb_28079027_no_train, df_mar_28079027_no_train], ignore_index = 'True')
-df_28079039_no_train = pd.concat([df_jan_28079039_no_train, df_feb_28079039_no_train, df_mar_28079039_no_train], ignore_index = 'True')
-df_28079049_no_train = pd.concat([df_jan_28079049_no_train, df_feb_28079049_no_train, df_mar_28079049_no_train], ignore_index = 'True')
-df_28079054_no_train = pd.concat([df_jan_28079054_no_train, df_feb_28079054_no_train, df_mar_28079054_no_train], ignore_index = 'True')
-df_28079058_no_train = pd.concat([df_jan_28079058_no_train, df_feb_28079058_no_train, df_mar_28079058_no_train], ignore_index = 'True')
-df_28079059_no_train = pd.concat([df_jan_28079059_no_train, df_feb_28079059_no_train, df_mar_28079059_no_train], ignore_index = 'True')
-
-
-# Test Data
-df_28079004_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079004_7_8_apr.json", gas="no").iloc[0:192]
-df_28079016_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079016_7_8_apr.json", gas="no").iloc[0:192]
-df_28079017_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079017_7_8_apr.json", gas="no").iloc[0:192]
-df_28079027_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079027_7_8_apr.json", gas="no").iloc[0:192]
-df_28079039_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079039_7_8_apr.json", gas="no").iloc[0:192]
-df_28079049_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079049_7_8_apr.json", gas="no").iloc[0:192]
-df_28079054_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079054_7_8_apr.json", gas="no").iloc[0:192]
-df_28079058_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079058_7_8_apr.json", gas="no").iloc[0:192]
-df_28079059_no_test = read_air_data("data_air_json/apr/air_quality_observed_28079059_7_8_apr.json", gas="no").iloc[0:192]
-
-
-# ### NO2
-
-# In[ ]:
-
-
-for stations in stations_no2:
-    print(f'df_mar_{stations.split("_")[0]}_no2_train = read_air_data("data_air_json/mar/air_quality_observed_{stations}_mar.json", gas="no2")')
-
-
-# In[46]:
-
-
-df_jan_28079004_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079004_8_8_jan.json", gas="no2")
-df_jan_28079008_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079008_8_8_jan.json", gas="no2")
-df_jan_28079011_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079011_8_8_jan.json", gas="no2")
-df_jan_28079016_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079016_8_8_jan.json", gas="no2")
-df_jan_28079017_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079017_8_8_jan.json", gas="no2")
-df_jan_28079018_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079018_8_8_jan.json", gas="no2")
-df_jan_28079024_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079024_8_8_jan.json", gas="no2")
-df_jan_28079027_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079027_8_8_jan.json", gas="no2")
-df_jan_28079035_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079035_8_8_jan.json", gas="no2")
-df_jan_28079036_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079036_8_8_jan.json", gas="no2")
-df_jan_28079038_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079038_8_8_jan.json", gas="no2")
-df_jan_28079039_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079039_8_8_jan.json", gas="no2")
-df_jan_28079040_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079040_8_8_jan.json", gas="no2")
-df_jan_28079047_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079047_8_8_jan.json", gas="no2")
-df_jan_28079048_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079048_8_8_jan.json", gas="no2")
-df_jan_28079049_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079049_8_8_jan.json", gas="no2")
-df_jan_28079050_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079050_8_8_jan.json", gas="no2")
-df_jan_28079054_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079054_8_8_jan.json", gas="no2")
-df_jan_28079055_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079055_8_8_jan.json", gas="no2")
-df_jan_28079056_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079056_8_8_jan.json", gas="no2")
-df_jan_28079057_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079057_8_8_jan.json", gas="no2")
-df_jan_28079058_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079058_8_8_jan.json", gas="no2")
-df_jan_28079059_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079059_8_8_jan.json", gas="no2")
-df_jan_28079060_no2_train = read_air_data("data_air_json/jan/air_quality_observed_28079060_8_8_jan.json", gas="no2")
-
-df_feb_28079004_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079004_8_8_feb.json", gas="no2")
-df_feb_28079008_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079008_8_8_feb.json", gas="no2")
-df_feb_28079011_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079011_8_8_feb.json", gas="no2")
-df_feb_28079016_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079016_8_8_feb.json", gas="no2")
-df_feb_28079017_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079017_8_8_feb.json", gas="no2")
-df_feb_28079018_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079018_8_8_feb.json", gas="no2")
-df_feb_28079024_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079024_8_8_feb.json", gas="no2")
-df_feb_28079027_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079027_8_8_feb.json", gas="no2")
-df_feb_28079035_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079035_8_8_feb.json", gas="no2")
-df_feb_28079036_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079036_8_8_feb.json", gas="no2")
-df_feb_28079038_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079038_8_8_feb.json", gas="no2")
-df_feb_28079039_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079039_8_8_feb.json", gas="no2")
-df_feb_28079040_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079040_8_8_feb.json", gas="no2")
-df_feb_28079047_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079047_8_8_feb.json", gas="no2")
-df_feb_28079048_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079048_8_8_feb.json", gas="no2")
-df_feb_28079049_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079049_8_8_feb.json", gas="no2")
-df_feb_28079050_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079050_8_8_feb.json", gas="no2")
-df_feb_28079054_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079054_8_8_feb.json", gas="no2")
-df_feb_28079055_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079055_8_8_feb.json", gas="no2")
-df_feb_28079056_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079056_8_8_feb.json", gas="no2")
-df_feb_28079057_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079057_8_8_feb.json", gas="no2")
-df_feb_28079058_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079058_8_8_feb.json", gas="no2")
-df_feb_28079059_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079059_8_8_feb.json", gas="no2")
-df_feb_28079060_no2_train = read_air_data("data_air_json/feb/air_quality_observed_28079060_8_8_feb.json", gas="no2")
-
-df_mar_28079004_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079004_8_8_mar.json", gas="no2")
-df_mar_28079008_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079008_8_8_mar.json", gas="no2")
-df_mar_28079011_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079011_8_8_mar.json", gas="no2")
-df_mar_28079016_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079016_8_8_mar.json", gas="no2")
-df_mar_28079017_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079017_8_8_mar.json", gas="no2")
-df_mar_28079018_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079018_8_8_mar.json", gas="no2")
-df_mar_28079024_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079024_8_8_mar.json", gas="no2")
-df_mar_28079027_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079027_8_8_mar.json", gas="no2")
-df_mar_28079035_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079035_8_8_mar.json", gas="no2")
-df_mar_28079036_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079036_8_8_mar.json", gas="no2")
-df_mar_28079038_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079038_8_8_mar.json", gas="no2")
-df_mar_28079039_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079039_8_8_mar.json", gas="no2")
-df_mar_28079040_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079040_8_8_mar.json", gas="no2")
-df_mar_28079047_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079047_8_8_mar.json", gas="no2")
-df_mar_28079048_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079048_8_8_mar.json", gas="no2")
-df_mar_28079049_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079049_8_8_mar.json", gas="no2")
-df_mar_28079050_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079050_8_8_mar.json", gas="no2")
-df_mar_28079054_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079054_8_8_mar.json", gas="no2")
-df_mar_28079055_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079055_8_8_mar.json", gas="no2")
-df_mar_28079056_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079056_8_8_mar.json", gas="no2")
-df_mar_28079057_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079057_8_8_mar.json", gas="no2")
-df_mar_28079058_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079058_8_8_mar.json", gas="no2")
-df_mar_28079059_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079059_8_8_mar.json", gas="no2")
-df_mar_28079060_no2_train = read_air_data("data_air_json/mar/air_quality_observed_28079060_8_8_mar.json", gas="no2")
-
-# Concat Train Data
-df_28079004_no2_train = pd.concat([df_jan_28079004_no2_train, df_feb_28079004_no2_train, df_mar_28079004_no2_train], ignore_index = 'True')
-df_28079016_no2_train = pd.concat([df_jan_28079016_no2_train, df_feb_28079016_no2_train, df_mar_28079016_no2_train], ignore_index = 'True')
-df_28079017_no2_train = pd.concat([df_jan_28079017_no2_train, df_feb_28079017_no2_train, df_mar_28079017_no2_train], ignore_index = 'True')
-df_28079027_no2_train = pd.concat([df_jan_28079027_no2_train, df_feb_28079027_no2_train, df_mar_28079027_no2_train], ignore_index = 'True')
-df_28079039_no2_train = pd.concat([df_jan_28079039_no2_train, df_feb_28079039_no2_train, df_mar_28079039_no2_train], ignore_index = 'True')
-df_28079049_no2_train = pd.concat([df_jan_28079049_no2_train, df_feb_28079049_no2_train, df_mar_28079049_no2_train], ignore_index = 'True')
-df_28079054_no2_train = pd.concat([df_jan_28079054_no2_train, df_feb_28079054_no2_train, df_mar_28079054_no2_train], ignore_index = 'True')
-df_28079058_no2_train = pd.concat([df_jan_28079058_no2_train, df_feb_28079058_no2_train, df_mar_28079058_no2_train], ignore_index = 'True')
-df_28079059_no2_train = pd.concat([df_jan_28079059_no2_train, df_feb_28079059_no2_train, df_mar_28079059_no2_train], ignore_index = 'True')
-
-
-# Test Data
-df_28079004_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079004_8_8_apr.json", gas="no2").iloc[0:192]
-df_28079016_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079016_8_8_apr.json", gas="no2").iloc[0:192]
-df_28079017_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079017_8_8_apr.json", gas="no2").iloc[0:192]
-df_28079027_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079027_8_8_apr.json", gas="no2").iloc[0:192]
-df_28079039_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079039_8_8_apr.json", gas="no2").iloc[0:192]
-df_28079049_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079049_8_8_apr.json", gas="no2").iloc[0:192]
-df_28079054_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079054_8_8_apr.json", gas="no2").iloc[0:192]
-df_28079058_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079058_8_8_apr.json", gas="no2").iloc[0:192]
-df_28079059_no2_test = read_air_data("data_air_json/apr/air_quality_observed_28079059_8_8_apr.json", gas="no2").iloc[0:192]
-
-
-# ### NOx
-
-# In[ ]:
+def load_air_columnar(months, gas, station, root="data_air_arrow"):
+    # Several months of one station/gas back to back, e.g. the Jan-Mar training series
+    frames = [read_air_columnar(month, gas, station, root) for month in months]
+    return pd.concat(frames, ignore_index=True)
 
 
-for stations in stations_nox:
-    print(f'df_mar_{stations.split("_")[0]}_nox_train = read_air_data("data_air_json/mar/air_quality_observed_{stations}_mar.json", gas="nox")')
-
-
-# In[47]:
-
-
-df_jan_28079004_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079004_12_8_jan.json", gas="nox")
-df_jan_28079008_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079008_12_8_jan.json", gas="nox")
-df_jan_28079011_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079011_12_8_jan.json", gas="nox")
-df_jan_28079016_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079016_12_8_jan.json", gas="nox")
-df_jan_28079017_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079017_12_8_jan.json", gas="nox")
-df_jan_28079018_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079018_12_8_jan.json", gas="nox")
-df_jan_28079024_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079024_12_8_jan.json", gas="nox")
-df_jan_28079027_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079027_12_8_jan.json", gas="nox")
-df_jan_28079035_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079035_12_8_jan.json", gas="nox")
-df_jan_28079036_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079036_12_8_jan.json", gas="nox")
-df_jan_28079038_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079038_12_8_jan.json", gas="nox")
-df_jan_28079039_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079039_12_8_jan.json", gas="nox")
-df_jan_28079040_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079040_12_8_jan.json", gas="nox")
-df_jan_28079047_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079047_12_8_jan.json", gas="nox")
-df_jan_28079048_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079048_12_8_jan.json", gas="nox")
-df_jan_28079049_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079049_12_8_jan.json", gas="nox")
-df_jan_28079050_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079050_12_8_jan.json", gas="nox")
-df_jan_28079054_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079054_12_8_jan.json", gas="nox")
-df_jan_28079055_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079055_12_8_jan.json", gas="nox")
-df_jan_28079056_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079056_12_8_jan.json", gas="nox")
-df_jan_28079057_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079057_12_8_jan.json", gas="nox")
-df_jan_28079058_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079058_12_8_jan.json", gas="nox")
-df_jan_28079059_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079059_12_8_jan.json", gas="nox")
-df_jan_28079060_nox_train = read_air_data("data_air_json/jan/air_quality_observed_28079060_12_8_jan.json", gas="nox")
-
-df_feb_28079004_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079004_12_8_feb.json", gas="nox")
-df_feb_28079008_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079008_12_8_feb.json", gas="nox")
-df_feb_28079011_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079011_12_8_feb.json", gas="nox")
-df_feb_28079016_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079016_12_8_feb.json", gas="nox")
-df_feb_28079017_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079017_12_8_feb.json", gas="nox")
-df_feb_28079018_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079018_12_8_feb.json", gas="nox")
-df_feb_28079024_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079024_12_8_feb.json", gas="nox")
-df_feb_28079027_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079027_12_8_feb.json", gas="nox")
-df_feb_28079035_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079035_12_8_feb.json", gas="nox")
-df_feb_28079036_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079036_12_8_feb.json", gas="nox")
-df_feb_28079038_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079038_12_8_feb.json", gas="nox")
-df_feb_28079039_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079039_12_8_feb.json", gas="nox")
-df_feb_28079040_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079040_12_8_feb.json", gas="nox")
-df_feb_28079047_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079047_12_8_feb.json", gas="nox")
-df_feb_28079048_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079048_12_8_feb.json", gas="nox")
-df_feb_28079049_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079049_12_8_feb.json", gas="nox")
-df_feb_28079050_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079050_12_8_feb.json", gas="nox")
-df_feb_28079054_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079054_12_8_feb.json", gas="nox")
-df_feb_28079055_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079055_12_8_feb.json", gas="nox")
-df_feb_28079056_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079056_12_8_feb.json", gas="nox")
-df_feb_28079057_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079057_12_8_feb.json", gas="nox")
-df_feb_28079058_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079058_12_8_feb.json", gas="nox")
-df_feb_28079059_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079059_12_8_feb.json", gas="nox")
-df_feb_28079060_nox_train = read_air_data("data_air_json/feb/air_quality_observed_28079060_12_8_feb.json", gas="nox")
-
-df_mar_28079004_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079004_12_8_mar.json", gas="nox")
-df_mar_28079008_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079008_12_8_mar.json", gas="nox")
-df_mar_28079011_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079011_12_8_mar.json", gas="nox")
-df_mar_28079016_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079016_12_8_mar.json", gas="nox")
-df_mar_28079017_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079017_12_8_mar.json", gas="nox")
-df_mar_28079018_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079018_12_8_mar.json", gas="nox")
-df_mar_28079024_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079024_12_8_mar.json", gas="nox")
-df_mar_28079027_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079027_12_8_mar.json", gas="nox")
-df_mar_28079035_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079035_12_8_mar.json", gas="nox")
-df_mar_28079036_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079036_12_8_mar.json", gas="nox")
-df_mar_28079038_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079038_12_8_mar.json", gas="nox")
-df_mar_28079039_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079039_12_8_mar.json", gas="nox")
-df_mar_28079040_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079040_12_8_mar.json", gas="nox")
-df_mar_28079047_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079047_12_8_mar.json", gas="nox")
-df_mar_28079048_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079048_12_8_mar.json", gas="nox")
-df_mar_28079049_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079049_12_8_mar.json", gas="nox")
-df_mar_28079050_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079050_12_8_mar.json", gas="nox")
-df_mar_28079054_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079054_12_8_mar.json", gas="nox")
-df_mar_28079055_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079055_12_8_mar.json", gas="nox")
-df_mar_28079056_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079056_12_8_mar.json", gas="nox")
-df_mar_28079057_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079057_12_8_mar.json", gas="nox")
-df_mar_28079058_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079058_12_8_mar.json", gas="nox")
-df_mar_28079059_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079059_12_8_mar.json", gas="nox")
-df_mar_28079060_nox_train = read_air_data("data_air_json/mar/air_quality_observed_28079060_12_8_mar.json", gas="nox")
-
-# Concat Train Data
-df_28079004_nox_train = pd.concat([df_jan_28079004_nox_train, df_feb_28079004_nox_train, df_mar_28079004_nox_train], ignore_index = 'True')
-df_28079016_nox_train = pd.concat([df_jan_28079016_nox_train, df_feb_28079016_nox_train, df_mar_28079016_nox_train], ignore_index = 'True')
-df_28079017_nox_train = pd.concat([df_jan_28079017_nox_train, df_feb_28079017_nox_train, df_mar_28079017_nox_train], ignore_index = 'True')
-df_28079027_nox_train = pd.concat([df_jan_28079027_nox_train, df_feb_28079027_nox_train, df_mar_28079027_nox_train], ignore_index = 'True')
-df_28079039_nox_train = pd.concat([df_jan_28079039_nox_train, df_feb_28079039_nox_train, df_mar_28079039_nox_train], ignore_index = 'True')
-df_28079049_nox_train = pd.concat([df_jan_28079049_nox_train, df_feb_28079049_nox_train, df_mar_28079049_nox_train], ignore_index = 'True')
-df_28079054_nox_train = pd.concat([df_jan_28079054_nox_train, df_feb_28079054_nox_train, df_mar_28079054_nox_train], ignore_index = 'True')
-df_28079058_nox_train = pd.concat([df_jan_28079058_nox_train, df_feb_28079058_nox_train, df_mar_28079058_nox_train], ignore_index = 'True')
-df_28079059_nox_train = pd.concat([df_jan_28079059_nox_train, df_feb_28079059_nox_train, df_mar_28079059_nox_train], ignore_index = 'True')
-
-df_28079004_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079004_12_8_apr.json", gas="nox").iloc[0:192]
-df_28079016_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079016_12_8_apr.json", gas="nox").iloc[0:192]
-df_28079017_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079017_12_8_apr.json", gas="nox").iloc[0:192]
-df_28079027_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079027_12_8_apr.json", gas="nox").iloc[0:192]
-df_28079039_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079039_12_8_apr.json", gas="nox").iloc[0:192]
-df_28079049_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079049_12_8_apr.json", gas="nox").iloc[0:192]
-df_28079054_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079054_12_8_apr.json", gas="nox").iloc[0:192]
-df_28079058_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079058_12_8_apr.json", gas="nox").iloc[0:192]
-df_28079059_nox_test = read_air_data("data_air_json/apr/air_quality_observed_28079059_12_8_apr.json", gas="nox").iloc[0:192]
-
-
-# ### O3
+# ### Bulk Loading
+# - all (station, gas, month) files in parallel
+# - (station, gas, time) tensor for any month range
 
 # In[ ]:
 
 
-for stations in stations_o3:
-    print(f'df_mar_{stations.split("_")[0]}_o3_train = read_air_data("data_air_json/mar/air_quality_observed_{stations}_mar.json", gas="o3")')
-
-
-# In[52]:
-
-
-df_jan_28079008_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079008_14_6_jan.json", gas="o3")
-df_jan_28079016_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079016_14_6_jan.json", gas="o3")
-df_jan_28079017_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079017_14_6_jan.json", gas="o3")
-df_jan_28079018_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079018_14_6_jan.json", gas="o3")
-df_jan_28079024_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079024_14_6_jan.json", gas="o3")
-df_jan_28079027_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079027_14_6_jan.json", gas="o3")
-df_jan_28079035_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079035_14_6_jan.json", gas="o3")
-df_jan_28079039_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079039_14_6_jan.json", gas="o3")
-df_jan_28079049_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079049_14_6_jan.json", gas="o3")
-df_jan_28079054_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079054_14_6_jan.json", gas="o3")
-df_jan_28079058_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079058_14_6_jan.json", gas="o3")
-df_jan_28079059_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079059_14_6_jan.json", gas="o3")
-df_jan_28079060_o3_train = read_air_data("data_air_json/jan/air_quality_observed_28079060_14_6_jan.json", gas="o3")
+def _source_path(source, root, month, gas, code):
+    if source == "arrow":
+        return columnar_path(month, gas, root)
+    return json_path(month, code, root)
 
-df_feb_28079008_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079008_14_6_feb.json", gas="o3")
-df_feb_28079016_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079016_14_6_feb.json", gas="o3")
-df_feb_28079017_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079017_14_6_feb.json", gas="o3")
-df_feb_28079018_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079018_14_6_feb.json", gas="o3")
-df_feb_28079024_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079024_14_6_feb.json", gas="o3")
-df_feb_28079027_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079027_14_6_feb.json", gas="o3")
-df_feb_28079035_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079035_14_6_feb.json", gas="o3")
-df_feb_28079039_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079039_14_6_feb.json", gas="o3")
-df_feb_28079049_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079049_14_6_feb.json", gas="o3")
-df_feb_28079054_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079054_14_6_feb.json", gas="o3")
-df_feb_28079058_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079058_14_6_feb.json", gas="o3")
-df_feb_28079059_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079059_14_6_feb.json", gas="o3")
-df_feb_28079060_o3_train = read_air_data("data_air_json/feb/air_quality_observed_28079060_14_6_feb.json", gas="o3")
 
-df_mar_28079008_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079008_14_6_mar.json", gas="o3")
-df_mar_28079016_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079016_14_6_mar.json", gas="o3")
-df_mar_28079017_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079017_14_6_mar.json", gas="o3")
-df_mar_28079018_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079018_14_6_mar.json", gas="o3")
-df_mar_28079024_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079024_14_6_mar.json", gas="o3")
-df_mar_28079027_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079027_14_6_mar.json", gas="o3")
-df_mar_28079035_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079035_14_6_mar.json", gas="o3")
-df_mar_28079039_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079039_14_6_mar.json", gas="o3")
-df_mar_28079049_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079049_14_6_mar.json", gas="o3")
-df_mar_28079054_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079054_14_6_mar.json", gas="o3")
-df_mar_28079058_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079058_14_6_mar.json", gas="o3")
-df_mar_28079059_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079059_14_6_mar.json", gas="o3")
-df_mar_28079060_o3_train = read_air_data("data_air_json/mar/air_quality_observed_28079060_14_6_mar.json", gas="o3")
+def _read_series(source, root, month, gas, code):
+    if source == "arrow":
+        return read_air_columnar(month, gas, code, root)
+    return read_air_data(json_path(month, code, root), gas=gas)
 
-# Concat Train Data
-df_28079016_o3_train = pd.concat([df_jan_28079016_o3_train, df_feb_28079016_o3_train, df_mar_28079016_o3_train], ignore_index = 'True')
-df_28079017_o3_train = pd.concat([df_jan_28079017_o3_train, df_feb_28079017_o3_train, df_mar_28079017_o3_train], ignore_index = 'True')
-df_28079027_o3_train = pd.concat([df_jan_28079027_o3_train, df_feb_28079027_o3_train, df_mar_28079027_o3_train], ignore_index = 'True')
-df_28079039_o3_train = pd.concat([df_jan_28079039_o3_train, df_feb_28079039_o3_train, df_mar_28079039_o3_train], ignore_index = 'True')
-df_28079049_o3_train = pd.concat([df_jan_28079049_o3_train, df_feb_28079049_o3_train, df_mar_28079049_o3_train], ignore_index = 'True')
-df_28079054_o3_train = pd.concat([df_jan_28079054_o3_train, df_feb_28079054_o3_train, df_mar_28079054_o3_train], ignore_index = 'True')
-df_28079058_o3_train = pd.concat([df_jan_28079058_o3_train, df_feb_28079058_o3_train, df_mar_28079058_o3_train], ignore_index = 'True')
-df_28079059_o3_train = pd.concat([df_jan_28079059_o3_train, df_feb_28079059_o3_train, df_mar_28079059_o3_train], ignore_index = 'True')
 
+# Read many (station, gas, month) series at once, spread over a thread or process pool.
+# Returns {(station, gas, month): frame}; series the catalog does not know are skipped.
+def load_air_frames(catalog, stations, gases, months, source="json", root=None, max_workers=None, processes=False):
+    if source not in ("json", "arrow"):
+        raise ValueError(f"Unknown source '{source}', expected 'json' or 'arrow'")
+    if root is None:
+        root = "data_air_arrow" if source == "arrow" else "data_air_json"
 
-df_28079016_o3_test = read_air_data("data_air_json/apr/air_quality_observed_28079016_14_6_apr.json", gas="o3").iloc[0:192]
-df_28079017_o3_test = read_air_data("data_air_json/apr/air_quality_observed_28079017_14_6_apr.json", gas="o3").iloc[0:192]
-df_28079027_o3_test = read_air_data("data_air_json/apr/air_quality_observed_28079027_14_6_apr.json", gas="o3").iloc[0:192]
-df_28079039_o3_test = read_air_data("data_air_json/apr/air_quality_observed_28079039_14_6_apr.json", gas="o3").iloc[0:192]
-df_28079049_o3_test = read_air_data("data_air_json/apr/air_quality_observed_28079049_14_6_apr.json", gas="o3").iloc[0:192]
-df_28079054_o3_test = read_air_data("data_air_json/apr/air_quality_observed_28079054_14_6_apr.json", gas="o3").iloc[0:192]
-df_28079058_o3_test = read_air_data("data_air_json/apr/air_quality_observed_28079058_14_6_apr.json", gas="o3").iloc[0:192]
-df_28079059_o3_test = read_air_data("data_air_json/apr/air_quality_observed_28079059_14_6_apr.json", gas="o3").iloc[0:192]
+    keys = [(station.split('_')[0], gas, month)
+            for station in stations for gas in gases for month in months
+            if catalog.has(station, gas)]
 
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    with executor_class(max_workers=max_workers) as executor:
+        futures = [executor.submit(_read_series, source, root, month, gas, catalog.code(station, gas))
+                   for station, gas, month in keys]
+        frames = [future.result() for future in futures]
 
-# ### CO
+    return dict(zip(keys, frames))
 
-# In[65]:
 
+# (station, gas, time) array for a month range. Every series is placed on the union of
+# observedAt timestamps, so a missing hour or a gas a station does not measure is NaN.
+def load_air_tensor(catalog, months, stations=None, gases=None, dtype=np.float32, **load_kwargs):
+    stations = [station.split('_')[0] for station in (stations or catalog.stations)]
+    gases = list(gases or catalog.gases)
+    frames = load_air_frames(catalog, stations, gases, months, **load_kwargs)
 
-df_jan_28079004_co_train = read_air_data("data_air_json/jan/air_quality_observed_28079004_6_48_jan.json", gas="co")
-
-df_feb_28079004_co_train = read_air_data("data_air_json/feb/air_quality_observed_28079004_6_48_feb.json", gas="co")
-
-df_mar_28079004_co_train = read_air_data("data_air_json/mar/air_quality_observed_28079004_6_48_mar.json", gas="co")
+    series = {}
+    for station in stations:
+        for gas in gases:
+            parts = [frames[(station, gas, month)] for month in months if (station, gas, month) in frames]
+            if parts:
+                joined = pd.concat(parts, ignore_index=True)
+                series[(station, gas)] = pd.Series(joined['value'].to_numpy(), index=joined['observedAt'])
 
-df_28079004_co_train = pd.concat([df_jan_28079004_co_train, df_feb_28079004_co_train, df_mar_28079004_co_train], ignore_index = 'True')
+    times = pd.DatetimeIndex([], tz='UTC')
+    for values in series.values():
+        times = times.union(values.index)
+    tensor = np.full((len(stations), len(gases), len(times)), np.nan, dtype=dtype)
+    for (station, gas), values in series.items():
+        values = values[~values.index.duplicated(keep='last')]
+        tensor[stations.index(station), gases.index(gas)] = values.reindex(times).to_numpy()
 
-df_28079004_co_test = read_air_data("data_air_json/apr/air_quality_observed_28079004_6_48_apr.json", gas="co").iloc[0:192]
+    return tensor, times, stations, gases
 
 
 # ### Scaling
+# - running min-max scaler, saved with the models
 
 # In[ ]:
 
 
-df_28079004_train = pd.concat([df_28079004_no_train['value'], df_28079004_no2_train['value'], df_28079004_nox_train['value'], df_28079004_co_train['value']], axis=1, ignore_index = 'True')
-
-df_28079016_train = pd.concat([df_28079016_no_train['value'], df_28079016_no2_train['value'], df_28079016_nox_train['value'], df_28079016_o3_train['value']], axis=1, ignore_index = 'True')
-df_28079017_train = pd.concat([df_28079017_no_train['value'], df_28079017_no2_train['value'], df_28079017_nox_train['value'], df_28079017_o3_train['value']], axis=1, ignore_index = 'True')
-df_28079027_train = pd.concat([df_28079027_no_train['value'], df_28079027_no2_train['value'], df_28079027_nox_train['value'], df_28079027_o3_train['value']], axis=1, ignore_index = 'True')
-df_28079039_train = pd.concat([df_28079039_no_train['value'], df_28079039_no2_train['value'], df_28079039_nox_train['value'], df_28079039_o3_train['value']], axis=1, ignore_index = 'True')
-df_28079049_train = pd.concat([df_28079049_no_train['value'], df_28079049_no2_train['value'], df_28079049_nox_train['value'], df_28079049_o3_train['value']], axis=1, ignore_index = 'True')
-df_28079054_train = pd.concat([df_28079054_no_train['value'], df_28079054_no2_train['value'], df_28079054_nox_train['value'], df_28079054_o3_train['value']], axis=1, ignore_index = 'True')
-df_28079058_train = pd.concat([df_28079058_no_train['value'], df_28079058_no2_train['value'], df_28079058_nox_train['value'], df_28079058_o3_train['value']], axis=1, ignore_index = 'True')
-df_28079059_train = pd.concat([df_28079059_no_train['value'], df_28079059_no2_train['value'], df_28079059_nox_train['value'], df_28079059_o3_train['value']], axis=1, ignore_index = 'True')
-
-df_all_train = pd.concat([df_28079004_train, df_28079016_train, df_28079017_train, df_28079027_train, df_28079039_train,df_28079049_train, df_28079054_train, df_28079058_train, df_28079059_train ], axis=0, ignore_index=True)
-
-
-# In[115]:
-
-
-df_all_train.shape
-
+# Min-max scaler that can be fitted chunk by chunk (running min/max) and saved as JSON next to
+# the models, so inference scales and un-scales with exactly the statistics used in training.
+class RunningMinMaxScaler:
+    def __init__(self, data_min=None, data_max=None, n_samples=0):
+        self.data_min = None if data_min is None else np.asarray(data_min, dtype=np.float64)
+        self.data_max = None if data_max is None else np.asarray(data_max, dtype=np.float64)
+        self.n_samples = n_samples
+
+    def partial_fit(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        if len(values) == 0:
+            return self
+
+        chunk_min, chunk_max = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+        if self.data_min is None:
+            self.data_min, self.data_max = chunk_min, chunk_max
+        else:
+            self.data_min = np.fmin(self.data_min, chunk_min)
+            self.data_max = np.fmax(self.data_max, chunk_max)
+        self.n_samples += len(values)
+        return self
+
+    def fit(self, chunks):
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        return self
+
+    @property
+    def data_range(self):
+        # A constant column scales to 0 instead of dividing by zero
+        data_range = self.data_max - self.data_min
+        return np.where(data_range == 0, 1.0, data_range)
+
+    def _apply(self, values, function):
+        if self.data_min is None:
+            raise ValueError("RunningMinMaxScaler is not fitted yet")
+        if isinstance(values, pd.DataFrame):
+            return pd.DataFrame(function(values.to_numpy(dtype=np.float64)), index=values.index, columns=values.columns)
+        return function(np.asarray(values, dtype=np.float64))
+
+    def transform(self, values):
+        return self._apply(values, lambda array: (array - self.data_min) / self.data_range)
+
+    def inverse_transform(self, values):
+        return self._apply(values, lambda array: array * self.data_range + self.data_min)
+
+    def save(self, path):
+        with open(path, 'w') as json_file:
+            json.dump({'data_min': self.data_min.tolist(), 'data_max': self.data_max.tolist(),
+                       'n_samples': self.n_samples}, json_file, indent=4)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as json_file:
+            return cls(**json.load(json_file))
+
+
+# ### Training Data
+# - per-station NO/NO2/NOx/O3 frames, min-max scaled
 
 # In[ ]:
 
 
-df_28079004_test = pd.concat([df_28079004_no_test['value'], df_28079004_no2_test['value'], df_28079004_nox_test['value'], df_28079004_co_test['value']], axis=1, ignore_index = 'True')
-
-df_28079016_test = pd.concat([df_28079016_no_test['value'], df_28079016_no2_test['value'], df_28079016_nox_test['value'], df_28079016_o3_test['value']], axis=1, ignore_index = 'True')
-df_28079017_test = pd.concat([df_28079017_no_test['value'], df_28079017_no2_test['value'], df_28079017_nox_test['value'], df_28079017_o3_test['value']], axis=1, ignore_index = 'True')
-df_28079027_test = pd.concat([df_28079027_no_test['value'], df_28079027_no2_test['value'], df_28079027_nox_test['value'], df_28079027_o3_test['value']], axis=1, ignore_index = 'True')
-df_28079039_test = pd.concat([df_28079039_no_test['value'], df_28079039_no2_test['value'], df_28079039_nox_test['value'], df_28079039_o3_test['value']], axis=1, ignore_index = 'True')
-df_28079049_test = pd.concat([df_28079049_no_test['value'], df_28079049_no2_test['value'], df_28079049_nox_test['value'], df_28079049_o3_test['value']], axis=1, ignore_index = 'True')
-df_28079054_test = pd.concat([df_28079054_no_test['value'], df_28079054_no2_test['value'], df_28079054_nox_test['value'], df_28079054_o3_test['value']], axis=1, ignore_index = 'True')
-df_28079058_test = pd.concat([df_28079058_no_test['value'], df_28079058_no2_test['value'], df_28079058_nox_test['value'], df_28079058_o3_test['value']], axis=1, ignore_index = 'True')
-df_28079059_test = pd.concat([df_28079059_no_test['value'], df_28079059_no2_test['value'], df_28079059_nox_test['value'], df_28079059_o3_test['value']], axis=1, ignore_index = 'True')
-
-df_all_test = pd.concat([df_28079004_test, df_28079016_test, df_28079017_test, df_28079027_test,df_28079039_test,df_28079049_test, df_28079054_test, df_28079058_test, df_28079059_test], axis=0, ignore_index=True)
-
-
-# In[120]:
-
-
-df_all_test.shape
-
+# Stations used to train the LSTM models and the four gases fed to each of them.
+# A station without one of the gases uses its fallback (28079004 has no O3 and uses CO).
+TRAINING_STATIONS = ['28079004', '28079016', '28079017', '28079027', '28079039',
+                     '28079049', '28079054', '28079058', '28079059']
+FEATURE_GASES = ['no', 'no2', 'nox', 'o3']
+FEATURE_FALLBACKS = {'o3': 'co'}
+
+
+def feature_gases(catalog, station):
+    return [gas if catalog.has(station, gas) else FEATURE_FALLBACKS.get(gas, gas) for gas in FEATURE_GASES]
+
+
+GAP_FILLS = ("none", "ffill", "interpolate", "drop", "raise")
+
+
+# Runs of missing hours per gas as a table (gas, start, end, missing_hours)
+def find_gaps(present, grid, gases):
+    rows = []
+    for column, gas in enumerate(gases):
+        missing = ~present[:, column]
+        if not missing.any():
+            continue
+        # Run boundaries from the 0/1 changes of the missing mask
+        edges = np.diff(np.concatenate([[0], missing.astype(np.int8), [0]]))
+        for start, stop in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            rows.append((gas, grid[start], grid[stop - 1], stop - start))
+    return pd.DataFrame(rows, columns=['gas', 'start', 'end', 'missing_hours'])
+
+
+# Join the gases of one station on a shared hourly observedAt index.
+# gas_frames: {gas: frame with observedAt/value} as returned by read_air_data or read_air_columnar.
+# Fast path: when every gas already has the same sorted, gap-free timestamps the values are just
+# stacked. Otherwise all gases are placed on the hourly grid in one vectorized searchsorted pass.
+# gap_fill: "none" (leave NaN), "ffill", "interpolate" (linear, in time), "drop" (rows with any gap)
+# or "raise". `limit` caps how many consecutive hours ffill/interpolate may fill. Both fills also carry
+# the first/last observation of a gas that starts late or ends early out to the edges, and drop the
+# rows still missing a gas after that (gaps longer than `limit`), so a filled frame never holds NaN.
+# A null value counts as a missing hour.
+# Returns the aligned frame (columns = gases) and the gap report from find_gaps.
+def align_gases(gas_frames, freq='h', gap_fill="none", limit=None):
+    if gap_fill not in GAP_FILLS:
+        raise ValueError(f"Unknown gap_fill '{gap_fill}', expected one of {GAP_FILLS}")
+
+    gases = list(gas_frames)
+    times = [pd.DatetimeIndex(frame['observedAt']).as_unit('ns') for frame in gas_frames.values()]
+    values = [frame['value'].to_numpy(dtype=np.float64) for frame in gas_frames.values()]
+    step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+
+    # Sorted-merge fast path
+    reference = times[0]
+    regular = reference.is_monotonic_increasing and ((reference[1:] - reference[:-1]) == step).all()
+    if regular and all(t.equals(reference) for t in times[1:]) and not any(np.isnan(v).any() for v in values):
+        aligned = pd.DataFrame(np.column_stack(values), index=reference.rename('observedAt'), columns=gases)
+        return aligned, find_gaps(np.ones(aligned.shape, dtype=bool), reference, gases)
+
+    grid = pd.date_range(min(t.min() for t in times), max(t.max() for t in times), freq=freq, name='observedAt', unit='ns')
+    matrix = np.full((len(grid), len(gases)), np.nan)
+    present = np.zeros((len(grid), len(gases)), dtype=bool)
+
+    # All gases at once: (grid row, gas column, value) for every observation
+    all_times = np.concatenate([t.asi8 for t in times])
+    all_columns = np.concatenate([np.full(len(t), column) for column, t in enumerate(times)])
+    all_values = np.concatenate(values)
+    rows = np.searchsorted(grid.asi8, all_times)
+    on_grid = (rows < len(grid)) & (grid.asi8[np.minimum(rows, len(grid) - 1)] == all_times)
+    matrix[rows[on_grid], all_columns[on_grid]] = all_values[on_grid]
+    present[rows[on_grid], all_columns[on_grid]] = ~np.isnan(all_values[on_grid])
+
+    gaps = find_gaps(present, grid, gases)
+    aligned = pd.DataFrame(matrix, index=grid, columns=gases)
+
+    if gap_fill == "raise" and not gaps.empty:
+        raise ValueError(f"{len(gaps)} gaps ({gaps['missing_hours'].sum()} missing hours) in {', '.join(gaps['gas'].unique())}")
+    if gap_fill in ("ffill", "interpolate"):
+        if gap_fill == "ffill":
+            aligned = aligned.ffill(limit=limit)
+        else:
+            aligned = aligned.interpolate(method='time', limit=limit, limit_area='inside')
+        # Leading/trailing gaps have nothing to fill from on one side
+        aligned = aligned.bfill(limit=limit, limit_area='outside').ffill(limit=limit, limit_area='outside')
+        aligned = aligned.dropna()
+    elif gap_fill == "drop":
+        aligned = aligned[present.all(axis=1)]
+
+    return aligned, gaps
+
+
+# Gas values of one station side by side on the shared hourly index, indexed by (station, observedAt).
+# Returns the frame and its gap report (see align_gases for gap_fill/limit).
+def station_frame(station, gas_frames, gap_fill="interpolate", limit=None):
+    aligned, gaps = align_gases(gas_frames, gap_fill=gap_fill, limit=limit)
+    index = pd.MultiIndex.from_arrays([np.full(len(aligned), station), aligned.index], names=['station', 'observedAt'])
+    gaps.insert(0, 'station', station)
+    return pd.DataFrame(aligned.to_numpy(), index=index), gaps
+
+
+# Row range of each station in a frame built by stacking `frames_by_station`
+def station_offsets(frames_by_station):
+    lengths = np.array([len(frame) for frame in frames_by_station.values()])
+    stops = np.cumsum(lengths)
+    return pd.DataFrame({'start': stops - lengths, 'stop': stops},
+                        index=pd.Index(list(frames_by_station), name='station'))
+
+
+# One station's rows of a stacked frame as a positional slice (no search, no copy).
+# The first and last rows must be the station and the row after it another one, so offsets that
+# do not match the frame raise instead of returning a neighbour's rows.
+def station_slice(frame, offsets, station):
+    start, stop = offsets.at[station, 'start'], offsets.at[station, 'stop']
+    level = frame.index.names.index('station')
+    codes, labels = frame.index.codes[level], frame.index.levels[level]
+
+    # Station of single rows, read from the level codes without building the whole level
+    def row_station(row):
+        return labels[codes[row]] if 0 <= row < len(codes) else None
+
+    if stop > start and (row_station(start) != station or row_station(stop - 1) != station):
+        raise ValueError(f"Offsets do not match the frame: rows {start}..{stop - 1} are not all station {station}")
+    if row_station(stop) == station:
+        raise ValueError(f"Offsets do not match the frame: station {station} continues past row {stop}")
+    return frame.iloc[start:stop]
+
+
+def load_training_data(catalog=None, stations=TRAINING_STATIONS, train_months=('jan', 'feb', 'mar'),
+                       test_month='apr', test_hours=192, gap_fill="interpolate", gap_limit=None, scaler=None,
+                       cache_dir=None, **load_kwargs):
+    # scaler: an already fitted RunningMinMaxScaler (e.g. loaded from lstm_models/scaler.json);
+    # by default one is fitted on the train and test frames
+    # cache_dir: keep the aligned and scaled frames in a StageCache, keyed by the hashes of the
+    # JSON/Arrow files they were built from, so only stations whose files changed are re-read and re-aligned
+    if catalog is None:
+        catalog = StationCatalog.from_csv(f"{AIR_DATA_DIR}/{MONTH_FILES[train_months[0]]}")
+    cache = StageCache(cache_dir) if cache_dir is not None else None
+
+    months = list(train_months) + [test_month]
+    gases = sorted({gas for station in stations for gas in feature_gases(catalog, station)})
+    parts = {'train': list(train_months), 'test': [test_month]}
+
+    keys = {}
+    if cache is not None:
+        source = load_kwargs.get('source', "json")
+        root = load_kwargs.get('root') or ("data_air_arrow" if source == "arrow" else "data_air_json")
+        for station in stations:
+            for part, part_months in parts.items():
+                files = [_source_path(source, root, month, gas, catalog.code(station, gas))
+                         for gas in feature_gases(catalog, station) for month in part_months]
+                keys[(station, part)] = stage_key('align', files=files, station=station, gases=feature_gases(catalog, station),
+                                                  gap_fill=gap_fill, gap_limit=gap_limit)
+
+    # Only stations with a stale alignment are read
+    stale = [station for station in stations
+             if cache is None or not all(cache.has(keys[(station, part)]) for part in parts)]
+    frames = load_air_frames(catalog, stale, gases, months, **load_kwargs) if stale else {}
+
+    def align(station, part_months):
+        gas_frames = {gas: pd.concat([frames[(station, gas, month)] for month in part_months], ignore_index=True)
+                      for gas in feature_gases(catalog, station)}
+        return station_frame(station, gas_frames, gap_fill, gap_limit)
+
+    train, test, gaps = {}, {}, []
+    for station in stations:
+        aligned = {}
+        for part, part_months in parts.items():
+            compute = functools.partial(align, station, part_months)
+            aligned[part] = compute() if cache is None else cache.value(keys[(station, part)], compute)
+        train[station], train_gaps = aligned['train']
+        test[station], test_gaps = aligned['test']
+        test[station] = test[station].iloc[0:test_hours]
+        gaps += [train_gaps, test_gaps]
+
+    # Stacked frames keep the (station, observedAt) index; the offsets table maps stations to rows
+    df_all_train = pd.concat(train.values(), axis=0)
+    df_all_test = pd.concat(test.values(), axis=0)
+    train_offsets = station_offsets(train)
+    test_offsets = station_offsets(test)
+
+    # Min-max scaling over train + test
+    def scale(scaler):
+        if scaler is None:
+            scaler = RunningMinMaxScaler().partial_fit(df_all_train).partial_fit(df_all_test)
+        return scaler, scaler.transform(df_all_train), scaler.transform(df_all_test)
+
+    if cache is None:
+        scaler, df_all_train_scaled, df_all_test_scaled = scale(scaler)
+    else:
+        key = stage_key('scale', upstream=list(keys.values()), test_hours=test_hours,
+                        scaler=None if scaler is None else [scaler.data_min.tolist(), scaler.data_max.tolist()])
+        scaler, df_all_train_scaled, df_all_test_scaled = cache.value(key, functools.partial(scale, scaler))
+
+    return {
+        'catalog': catalog,
+        'df_all_train': df_all_train,
+        'df_all_test': df_all_test,
+        'scaler': scaler,
+        'df_all_train_scaled': df_all_train_scaled,
+        'df_all_test_scaled': df_all_test_scaled,
+        'train_offsets': train_offsets,
+        'test_offsets': test_offsets,
+        'train_scaled': {station: station_slice(df_all_train_scaled, train_offsets, station) for station in train},
+        'test_scaled': {station: station_slice(df_all_test_scaled, test_offsets, station) for station in test},
+        'gaps': pd.concat(gaps, ignore_index=True),
+    }
+
+
+# ### Lazy Access
+# - cached loaders and the old module-level frames as lazy attributes
 
 # In[ ]:
 
 
-df_all = pd.concat([df_all_train, df_all_test], axis = 0, ignore_index=True)
-df_all
+# Nothing is read at import time. The data is materialized on first use and cached,
+# so the notebooks (and repeated calls) pay the loading cost once per kernel.
+@functools.lru_cache(maxsize=None)
+def get_catalog():
+    return StationCatalog.from_csv(f"{AIR_DATA_DIR}/{MONTH_FILES['jan']}")
 
 
-# In[ ]:
-
+# With a cache_dir the reshaped months and training data are also kept on disk across kernels (see StageCache).
+@functools.lru_cache(maxsize=None)
+def get_formatted(month, data_dir=AIR_DATA_DIR, cache_dir=None):
+    if cache_dir is None:
+        return reshape_air_quality_data(read_air_csv(month, data_dir))
+    return StageCache(cache_dir).value(reshape_key(month, data_dir),
+                                       lambda: reshape_air_quality_data(read_air_csv(month, data_dir)))
 
-df_all_train_scaled = (df_all_train - df_all.min(axis=0)) / (df_all.max(axis=0) - df_all.min(axis=0))
-df_all_train_scaled
 
+@functools.lru_cache(maxsize=None)
+def get_training_data(scaler_path=None, cache_dir=STAGE_CACHE_DIR):
+    scaler = RunningMinMaxScaler.load(scaler_path) if scaler_path else None
+    return load_training_data(get_catalog(), scaler=scaler, cache_dir=cache_dir)
 
-# In[ ]:
 
+# Old module-level names are still available as lazy attributes,
+# e.g. air_data_preprocessor.df_all_train or air_data_preprocessor.df_28079004_train_scaled_value
+def __getattr__(name):
+    if name == 'catalog':
+        return get_catalog()
 
-df_all_test_scaled = (df_all_test - df_all.min(axis=0)) / (df_all.max(axis=0) - df_all.min(axis=0))
-df_all_test_scaled
+    match = re.fullmatch(r'air_(\w+?)_formatted', name)
+    if match and match.group(1) in MONTH_FILES:
+        return get_formatted(match.group(1))
 
+    if name in ('df_all_train', 'df_all_test', 'df_all_train_scaled', 'df_all_test_scaled', 'scaler'):
+        return get_training_data()[name]
 
-# In[121]:
+    match = re.fullmatch(r'df_(\d+)_(train|test)_scaled_value', name)
+    if match and match.group(1) in get_training_data()[f'{match.group(2)}_scaled']:
+        return get_training_data()[f'{match.group(2)}_scaled'][match.group(1)]
 
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-df_28079004_train_scaled_value = df_all_train_scaled.iloc[0:2184]
-df_28079016_train_scaled_value = df_all_train_scaled.iloc[2184:4368]
-df_28079017_train_scaled_value = df_all_train_scaled.iloc[4368:6552]
-df_28079027_train_scaled_value = df_all_train_scaled.iloc[6552:8736]
-df_28079039_train_scaled_value = df_all_train_scaled.iloc[8736:10872]
-df_28079049_train_scaled_value = df_all_train_scaled.iloc[10872:13056]
-df_28079054_train_scaled_value = df_all_train_scaled.iloc[13056:15240]
-df_28079058_train_scaled_value = df_all_train_scaled.iloc[15240:17424]
-df_28079059_train_scaled_value = df_all_train_scaled.iloc[17424:19608]
 
+# ### Parallel Preprocessing
+# - CSV -> NGSI-LD JSON / Arrow for every (month, gas) pair on a process pool
 
-# In[122]:
-
+# In[ ]:
 
-df_28079004_test_scaled_value = df_all_test_scaled.iloc[0:192]
-df_28079016_test_scaled_value = df_all_test_scaled.iloc[192:384]
-df_28079017_test_scaled_value = df_all_test_scaled.iloc[384:576]
-df_28079027_test_scaled_value = df_all_test_scaled.iloc[576:768]
-df_28079039_test_scaled_value = df_all_test_scaled.iloc[768:960]
-df_28079049_test_scaled_value = df_all_test_scaled.iloc[960:1152]
-df_28079054_test_scaled_value = df_all_test_scaled.iloc[1152:1344]
-df_28079058_test_scaled_value = df_all_test_scaled.iloc[1344:1536]
-df_28079059_test_scaled_value = df_all_test_scaled.iloc[1536:1728]
 
+def _preprocess_month_gas(month, gas, data_dir, outputs, json_root, arrow_root, seed, cache_dir, ngsild_kwargs):
+    cache = StageCache(cache_dir) if cache_dir is not None else None
+
+    # Run a stage, or skip it when the cache holds it for this month's CSV, gas and params
+    def stage(kind, name, compute, **params):
+        if cache is None:
+            return compute()
+        key = stage_key(name, upstream=[reshape_key(month, data_dir)], gas=gas, **params)
+        return getattr(cache, kind)(key, compute)
+
+    # Each worker reshapes a month once (get_formatted is cached per process), and only for stale stages
+    @functools.lru_cache(maxsize=None)
+    def gas_frame():
+        df = get_formatted(month, data_dir, cache_dir)
+        return StationCatalog(df['Station'].unique()).select(df, gas)
+
+    n_stations = stage('value', 'stations', lambda: int(gas_frame()['Station'].nunique()))
+    if n_stations == 0:
+        return month, gas, 0
+
+    def write_json():
+        os.makedirs(f"{json_root}/{month}", exist_ok=True)
+        # datasetIds depend only on (seed, month, gas), not on which worker ran the task
+        random.seed(f"{seed}:{month}:{gas}")
+        convert_to_ngsild(gas_frame(), month, gas=gas, output_dir=json_root, **ngsild_kwargs)
+        return ngsild_paths(gas_frame(), month, gas, ngsild_kwargs.get('writer', "station"), json_root)
+
+    if "json" in outputs:
+        stage('files', 'ngsild', write_json, seed=seed, output_dir=json_root,
+              **{'writer': "station", 'indent': 4, **ngsild_kwargs})
+    if "arrow" in outputs:
+        stage('files', 'arrow', lambda: write_air_columnar(gas_frame(), month, arrow_root), root=arrow_root)
+
+    return month, gas, n_stations
+
+
+# Rebuild the NGSI-LD JSON and/or Arrow outputs for many months and gases at once, e.g.
+#   run_preprocessing(months=['jan', 'feb', 'mar', 'apr'], gases=['no', 'no2', 'nox', 'o3', 'co'], max_workers=16)
+# Every (month, gas) pair writes its own files, so the result does not depend on scheduling.
+# Pairs whose CSV, parameters and written files are unchanged since the last run are skipped
+# through the stage cache in cache_dir (None always rebuilds).
+# Returns [(month, gas, number of stations)] in task order.
+def run_preprocessing(months=None, gases=None, max_workers=None, outputs=("json",), seed=0,
+                      data_dir=AIR_DATA_DIR, json_root="data_air_json", arrow_root="data_air_arrow",
+                      cache_dir=STAGE_CACHE_DIR, **ngsild_kwargs):
+    if months is None:
+        months = [month for month, csv_name in MONTH_FILES.items() if os.path.exists(f"{data_dir}/{csv_name}")]
+    if gases is None:
+        gases = list(GAS_MAGNITUDES)
+
+    # Month-major order so a worker tends to get several gases of the month it already reshaped
+    tasks = [(month, gas) for month in months for gas in gases]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_preprocess_month_gas, month, gas, data_dir, outputs,
+                                   json_root, arrow_root, seed, cache_dir, ngsild_kwargs)
+                   for month, gas in tasks]
+        return [future.result() for future in futures]
@@ -0,0 +1,194 @@
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from air_data_preprocessor import FEATURE_GASES, RunningMinMaxScaler
+
+
+# Last n_steps scaled observations of one station.
+# Every observation is written twice, n_steps rows apart, so buffer[pos:pos + n_steps] is always the
+# current window in time order as one contiguous slice: no shifting or copying per observation.
+class StationBuffer:
+    def __init__(self, n_steps=24, n_features=4):
+        self.n_steps = n_steps
+        self.buffer = np.zeros((1, 2 * n_steps, n_features), dtype=np.float32)
+        self.pos = 0
+        self.count = 0
+
+    def push(self, values):
+        self.buffer[0, self.pos] = values
+        self.buffer[0, self.pos + self.n_steps] = values
+        self.pos = (self.pos + 1) % self.n_steps
+        self.count = min(self.count + 1, self.n_steps)
+
+    @property
+    def ready(self):
+        return self.count == self.n_steps
+
+    def window(self):
+        return self.buffer[:, self.pos:self.pos + self.n_steps]
+
+
+# Online next-hour forecasts around the per-station models (see load_lstm_models).
+# observe() scales one raw observation, appends it to the station's buffer and, once 24 hours are
+# buffered, returns the next-hour prediction in raw units. History is never re-read.
+class ForecastService:
+    def __init__(self, models, scaler, n_steps=24, n_features=4):
+        from air_inference import compile_model
+
+        self.scaler = scaler
+        self.n_steps = n_steps
+        self.n_features = n_features
+        self.functions = {str(station): compile_model(model, n_steps, n_features, batch_size=1)
+                          for station, model in models.items()}
+        self.buffers = {station: StationBuffer(n_steps, n_features) for station in self.functions}
+        self.locks = {station: threading.Lock() for station in self.functions}
+
+        # Trace every graph now so the first request does not pay for it
+        for function in self.functions.values():
+            function(np.zeros((1, n_steps, n_features), dtype=np.float32))
+
+    @property
+    def stations(self):
+        return sorted(self.functions)
+
+    def _buffer(self, station):
+        station = str(station)
+        if station not in self.buffers:
+            raise KeyError(f"No model for station {station}")
+        return station, self.buffers[station]
+
+    # Fill a station's buffer from already scaled history, e.g. the last rows of test_scaled[station]
+    def prime(self, station, scaled_history):
+        station, buffer = self._buffer(station)
+        with self.locks[station]:
+            for values in np.asarray(scaled_history, dtype=np.float32)[-self.n_steps:]:
+                buffer.push(values)
+
+    # Caller holds the station's lock
+    def _predict_locked(self, station, buffer):
+        if not buffer.ready:
+            return None
+        return self.functions[station](buffer.window()).numpy()
+
+    def predict(self, station):
+        station, buffer = self._buffer(station)
+        with self.locks[station]:
+            prediction = self._predict_locked(station, buffer)
+        return None if prediction is None else self.scaler.inverse_transform(prediction)[0]
+
+    # Push and predict under one lock, so the prediction is for the window ending with these values
+    def observe(self, station, values):
+        station, buffer = self._buffer(station)
+        scaled = self.scaler.transform(np.asarray(values, dtype=np.float64).reshape(1, -1))[0]
+        with self.locks[station]:
+            buffer.push(scaled)
+            prediction = self._predict_locked(station, buffer)
+        return None if prediction is None else self.scaler.inverse_transform(prediction)[0]
+
+
+# POST /observe  {"station": "28079016", "values": [no, no2, nox, o3]}  (or {"no": ..., "no2": ..., ...})
+#   -> {"station": ..., "prediction": [...] or null until 24 hours are buffered, "latency_ms": ...}
+# GET  /predict?station=28079016  -> next-hour prediction from the current buffer
+# GET  /health                    -> served stations and how many hours each has buffered
+def make_handler(service):
+    class ForecastHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _forecast(self, station, values=None):
+            start = time.perf_counter()
+            try:
+                prediction = service.predict(station) if values is None else service.observe(station, values)
+            except KeyError as error:
+                return self._reply(404, {'error': str(error.args[0])})
+            except ValueError as error:
+                return self._reply(400, {'error': str(error)})
+            self._reply(200, {'station': str(station),
+                              'prediction': None if prediction is None else prediction.tolist(),
+                              'latency_ms': (time.perf_counter() - start) * 1000})
+
+        def do_GET(self):
+            if self.path == '/health':
+                return self._reply(200, {station: service.buffers[station].count for station in service.stations})
+            match = re.fullmatch(r'/predict\?station=(\w+)', self.path)
+            if match is None:
+                return self._reply(404, {'error': f"Unknown path {self.path}"})
+            self._forecast(match.group(1))
+
+        def do_POST(self):
+            if self.path != '/observe':
+                return self._reply(404, {'error': f"Unknown path {self.path}"})
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                values = request['values']
+                if isinstance(values, dict):
+                    values = [values[gas] for gas in FEATURE_GASES]
+                station = request['station']
+            except (ValueError, KeyError, TypeError) as error:
+                return self._reply(400, {'error': f"Bad request: {error}"})
+            self._forecast(station, values)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ForecastHandler
+
+
+def serve(service, host="127.0.0.1", port=8000):
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    print(f"Serving {len(service.stations)} stations on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# Models are read from {models_dir}/lstm_model_<station>.keras, the names the predictor saves them under.
+# Other models saved next to them (lstm_model_global.keras, lstm_model_<station>_72h.keras) are not served.
+def load_service(models_dir="lstm_models", scaler_path=None, n_steps=24, n_features=4):
+    from tensorflow.keras.models import load_model
+
+    matches = [re.search(r'lstm_model_(\d+)\.keras$', path)
+               for path in sorted(glob.glob(os.path.join(models_dir, "lstm_model_*.keras")))]
+    paths = {match.group(1): match.string for match in matches if match}
+    if not paths:
+        raise FileNotFoundError(f"No lstm_model_<station>.keras files in {models_dir}")
+    models = {station: load_model(path) for station, path in paths.items()}
+    scaler = RunningMinMaxScaler.load(scaler_path or os.path.join(models_dir, "scaler.json"))
+    return ForecastService(models, scaler, n_steps, n_features)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online next-hour forecasts per station over HTTP")
+    parser.add_argument("--models-dir", default="lstm_models")
+    parser.add_argument("--scaler", default=None, help="scaler JSON (default: <models-dir>/scaler.json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--prime", action="store_true",
+                        help="fill the buffers with the last 24 hours of the training test month")
+    args = parser.parse_args()
+
+    service = load_service(args.models_dir, args.scaler)
+    if args.prime:
+        from air_data_preprocessor import get_training_data
+
+        test_scaled = get_training_data(args.scaler or os.path.join(args.models_dir, "scaler.json"))['test_scaled']
+        for station in service.stations:
+            if station in test_scaled:
+                service.prime(station, test_scaled[station].to_numpy())
+    serve(service, args.host, args.port)
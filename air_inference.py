@@ -0,0 +1,186 @@
+import glob
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+
+from air_sequences import make_windows
+
+
+# Wrap a model in a tf.function with a fixed input signature: float32 (batch_size, n_steps, n_features)
+# windows, plus int64 station codes for the shared multi-station model. Repeated calls reuse one graph
+# instead of going through model.predict. batch_size=None accepts any batch size.
+def compile_model(model, n_steps=24, n_features=4, batch_size=None, shared=False):
+    window_spec = tf.TensorSpec([batch_size, n_steps, n_features], tf.float32)
+    if shared:
+        return tf.function(lambda window, station: model({'window': window, 'station': station}, training=False),
+                           input_signature=[window_spec, tf.TensorSpec([batch_size], tf.int64)])
+    return tf.function(lambda window: model(window, training=False), input_signature=[window_spec])
+
+
+# Batched inference for many stations at once.
+# models:       {station: model} with one create_lstm_model network per station, or
+# shared_model: one create_global_lstm_model network for every station.
+# Each model is compiled once with compile_model and windows are pushed through in batches of `batch_size`.
+class InferenceEngine:
+    def __init__(self, models=None, shared_model=None, n_steps=24, n_features=4, batch_size=4096):
+        if (models is None) == (shared_model is None):
+            raise ValueError("Pass either `models` (one per station) or `shared_model`")
+
+        self.n_steps = n_steps
+        self.n_features = n_features
+        self.batch_size = batch_size
+        self.last_stats = None
+
+        # Trace every compiled graph now, so predict() times inference and not the first-call tracing
+        window = np.zeros((1, n_steps, n_features), dtype=np.float32)
+        if shared_model is not None:
+            self.shared = compile_model(shared_model, n_steps, n_features, shared=True)
+            self.functions = {}
+            self.shared(window, np.zeros(1, dtype=np.int64))
+        else:
+            self.shared = None
+            # Exported TFLite/ONNX models (air_runtime) are already callable and are used as they are
+            self.functions = {}
+            for station, model in models.items():
+                if isinstance(model, tf.keras.Model):
+                    model = compile_model(model, n_steps, n_features)
+                    model(window)
+                self.functions[str(station)] = model
+
+    def _run(self, function, *inputs):
+        # Fixed-size batches through a compiled function
+        outputs = []
+        for i in range(0, len(inputs[0]), self.batch_size):
+            batch = [np.ascontiguousarray(x[i:i + self.batch_size]) for x in inputs]
+            outputs.append(np.asarray(function(*batch)))
+        if not outputs:
+            return np.empty((0, self.n_features), np.float32)
+        return np.concatenate(outputs)
+
+    # series_by_station: {station: scaled (time, features) array or frame}.
+    # Returns ({station: predictions}, {station: next-step targets}); all predictions live in one
+    # array and the per-station entries are views into it. Throughput goes to self.last_stats.
+    def predict(self, series_by_station, verbose=True):
+        windows, targets = {}, {}
+        for station, series in series_by_station.items():
+            windows[str(station)], targets[str(station)] = make_windows(np.asarray(series, dtype=np.float32), self.n_steps)
+
+        counts = [len(x) for x in windows.values()]
+        offsets = np.cumsum([0] + counts)
+
+        start = time.perf_counter()
+        if self.shared is not None:
+            # Every station in the same batches through the shared model
+            X = np.concatenate(list(windows.values()))
+            stations = np.repeat(np.array([int(station) for station in windows], dtype=np.int64), counts)
+            output = self._run(self.shared, X, stations)
+        else:
+            missing = set(windows) - set(self.functions)
+            if missing:
+                raise KeyError(f"No model for stations {sorted(missing)}")
+            output = np.concatenate([self._run(self.functions[station], X) for station, X in windows.items()])
+        elapsed = time.perf_counter() - start
+
+        self.last_stats = {'windows': int(offsets[-1]), 'seconds': elapsed,
+                           'windows_per_second': float(offsets[-1] / elapsed) if elapsed > 0 else float('inf')}
+        if verbose:
+            print(f"{self.last_stats['windows']} windows in {elapsed:.3f} s "
+                  f"({self.last_stats['windows_per_second']:.0f} windows/s)")
+
+        predictions = {station: output[a:b] for station, a, b in zip(windows, offsets[:-1], offsets[1:])}
+        return predictions, {station: np.asarray(y) for station, y in targets.items()}
+
+
+# Models on disk keyed by (station, version), loaded on first use and kept in a bounded LRU.
+# Every directory in `models_dirs` is one version, named after the directory (e.g. 'lstm_models_v1'),
+# and holds lstm_model_<station>.keras files; the first directory is the default version.
+# Only the index of files is built up front, so startup does not grow with the number of models.
+class ModelRegistry:
+    def __init__(self, models_dirs=("lstm_models",), max_models=32):
+        if isinstance(models_dirs, str):
+            models_dirs = (models_dirs,)
+        self.versions = [os.path.basename(os.path.normpath(models_dir)) for models_dir in models_dirs]
+        self.default_version = self.versions[0]
+        self.max_models = max_models
+
+        self.paths = {}
+        for version, models_dir in zip(self.versions, models_dirs):
+            for path in sorted(glob.glob(os.path.join(models_dir, "lstm_model_*.keras"))):
+                # Station models only: lstm_model_global.keras and lstm_model_<station>_72h.keras are skipped
+                match = re.search(r'lstm_model_(\d+)\.keras$', path)
+                if match:
+                    self.paths[(match.group(1), version)] = path
+
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}
+        self.hits = self.misses = self.loads = self.evictions = 0
+        self.load_seconds = 0.0
+
+    def keys(self, version=None):
+        return sorted(key for key in self.paths if version is None or key[1] == version)
+
+    def stations(self, version=None):
+        return [station for station, _ in self.keys(version or self.default_version)]
+
+    def __contains__(self, key):
+        return key in self.paths
+
+    def get(self, station, version=None):
+        key = (str(station), version or self.default_version)
+        if key not in self.paths:
+            raise KeyError(f"No model for station {key[0]} version {key[1]}")
+
+        with self.lock:
+            if key in self.models:
+                self.hits += 1
+                self.models.move_to_end(key)
+                return self.models[key]
+            self.misses += 1
+            # One lock per key: concurrent requests for the same model load it once
+            key_lock = self.loading.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.lock:
+                if key in self.models:
+                    self.models.move_to_end(key)
+                    return self.models[key]
+
+            from tensorflow.keras.models import load_model
+
+            start = time.perf_counter()
+            model = load_model(self.paths[key])
+            elapsed = time.perf_counter() - start
+
+            with self.lock:
+                self.loads += 1
+                self.load_seconds += elapsed
+                self.models[key] = model
+                while len(self.models) > self.max_models:
+                    self.models.popitem(last=False)
+                    self.evictions += 1
+                self.loading.pop(key, None)
+        return model
+
+    # Load models in background threads before they are requested (by default the first
+    # max_models of the default version). Returns the keys that were loaded.
+    def warm(self, keys=None, max_workers=4):
+        if keys is None:
+            keys = self.keys(self.default_version)
+        keys = [(str(station), version) for station, version in keys][:self.max_models]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda key: self.get(*key), keys))
+        return keys
+
+    def stats(self):
+        with self.lock:
+            return {'cached': len(self.models), 'max_models': self.max_models, 'available': len(self.paths),
+                    'hits': self.hits, 'misses': self.misses, 'loads': self.loads, 'evictions': self.evictions,
+                    'load_seconds': self.load_seconds,
+                    'mean_load_ms': self.load_seconds / self.loads * 1000 if self.loads else 0.0}
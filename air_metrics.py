@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+
+METRICS = ('MAE', 'MSE', 'RMSE', 'MAPE', 'R2', 'Bias')
+
+
+# Running error statistics over one axis of stacked arrays, e.g. y_true/y_pred of shape
+# (stations, samples, horizon, pollutants) reduced over axis=1 gives every metric per station x horizon x pollutant.
+# Each update() adds a chunk with a few vectorized reductions (no per-column loop) and only keeps the
+# per-cell sums, so evaluations larger than memory can be fed chunk by chunk; merge() combines
+# accumulators from separate workers. NaN pairs (gaps) are left out of every metric.
+class MetricsAccumulator:
+    def __init__(self):
+        self.count = None
+
+    def update(self, y_true, y_pred, axis=0):
+        y_true = np.asarray(y_true, dtype=np.float64)
+        y_pred = np.asarray(y_pred, dtype=np.float64)
+        if y_true.shape != y_pred.shape:
+            raise ValueError(f"y_true and y_pred shapes differ: {y_true.shape} vs {y_pred.shape}")
+
+        valid = np.isfinite(y_true) & np.isfinite(y_pred)
+        true = np.where(valid, y_true, 0.0)
+        error = np.where(valid, y_pred - y_true, 0.0)
+        # MAPE is only defined where the observation is not 0
+        relative = valid & (true != 0)
+        count = valid.sum(axis=axis)
+
+        # Mean and sum of squared deviations of y_true for R2, combined per chunk (Chan et al.)
+        # rather than as sum(x^2) - sum(x)^2 / n, which loses precision on long series
+        chunk_mean = true.sum(axis=axis) / np.maximum(count, 1)
+        chunk_m2 = (np.where(valid, true - np.expand_dims(chunk_mean, axis), 0.0) ** 2).sum(axis=axis)
+
+        chunk = {'count': count,
+                 'sum_error': error.sum(axis=axis),
+                 'sum_abs_error': np.abs(error).sum(axis=axis),
+                 'sum_sq_error': (error ** 2).sum(axis=axis),
+                 'sum_ape': (np.abs(error) / np.where(relative, np.abs(true), 1.0)).sum(axis=axis, where=relative),
+                 'count_ape': relative.sum(axis=axis),
+                 'mean_true': chunk_mean,
+                 'm2_true': chunk_m2}
+        return self._combine(chunk)
+
+    def merge(self, other):
+        if other.count is None:
+            return self
+        return self._combine({name: getattr(other, name) for name in
+                              ('count', 'sum_error', 'sum_abs_error', 'sum_sq_error', 'sum_ape', 'count_ape',
+                               'mean_true', 'm2_true')})
+
+    def _combine(self, chunk):
+        if self.count is None:
+            for name, value in chunk.items():
+                setattr(self, name, value)
+            return self
+
+        count = self.count + chunk['count']
+        delta = chunk['mean_true'] - self.mean_true
+        safe_count = np.maximum(count, 1)
+        self.mean_true = self.mean_true + delta * chunk['count'] / safe_count
+        self.m2_true = self.m2_true + chunk['m2_true'] + delta ** 2 * self.count * chunk['count'] / safe_count
+        for name in ('sum_error', 'sum_abs_error', 'sum_sq_error', 'sum_ape', 'count_ape'):
+            setattr(self, name, getattr(self, name) + chunk[name])
+        self.count = count
+        return self
+
+    def result(self):
+        if self.count is None:
+            raise ValueError("MetricsAccumulator has no data yet")
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            count = np.where(self.count > 0, self.count, np.nan)
+            mse = self.sum_sq_error / count
+            return {'MAE': self.sum_abs_error / count,
+                    'MSE': mse,
+                    'RMSE': np.sqrt(mse),
+                    'MAPE': 100 * self.sum_ape / np.where(self.count_ape > 0, self.count_ape, np.nan),
+                    'R2': 1 - self.sum_sq_error / np.where(self.m2_true > 0, self.m2_true, np.nan),
+                    'Bias': self.sum_error / count}
+
+
+# Every metric in METRICS for stacked arrays in one pass, reduced over `axis` (the sample axis).
+# MAPE is in percent; Bias is mean(y_pred - y_true), so a positive bias means over-prediction.
+def error_metrics(y_true, y_pred, axis=0):
+    return MetricsAccumulator().update(y_true, y_pred, axis=axis).result()
+
+
+# Metrics per column of (samples, columns) frames/arrays as a DataFrame with one row per column
+def metrics_frame(y_true, y_pred, columns=None):
+    if isinstance(y_true, pd.Series):
+        y_true, y_pred = y_true.to_frame(), pd.Series(y_pred).to_frame()
+    if columns is None:
+        columns = list(y_true.columns) if isinstance(y_true, pd.DataFrame) else list(range(np.shape(y_true)[1]))
+
+    metrics = error_metrics(np.asarray(y_true), np.asarray(y_pred), axis=0)
+    return pd.DataFrame({'Column': columns, **{name: metrics[name] for name in METRICS}})
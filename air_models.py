@@ -0,0 +1,192 @@
+import os
+
+import tensorflow as tf
+from tensorflow.keras import Input, Model, Sequential
+from tensorflow.keras.layers import LSTM, Dense, Dropout, Embedding, IntegerLookup, RepeatVector, Concatenate, Reshape
+from tensorflow.keras.optimizers import Adam
+from tensorflow.keras.callbacks import EarlyStopping
+
+from air_sequences import make_windows, make_horizon_windows, window_dataset, multi_window_dataset, timeseries_window_dataset
+
+
+# The per-station network trained by create_lstm_model: LSTM 128 -> LSTM 64 -> Dropout -> Dense, compiled
+# with Adam and MSE.
+def build_lstm_model(no_columns, units_layer_1=128, units_layer_2=64, dropout_rate=0.2, learning_rate=0.001, n_steps=24):
+    model = Sequential()
+    model.add(Input(shape=(n_steps, no_columns)))
+    # First LSTM layer
+    model.add(LSTM(units=units_layer_1, activation='relu', return_sequences=True))
+    # Second LSTM layer
+    model.add(LSTM(units=units_layer_2, activation='relu'))
+    # Dropout layer
+    model.add(Dropout(dropout_rate))
+    # Dense output layer
+    model.add(Dense(no_columns))
+    # Compile model
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
+    return model
+
+
+# Train one station's model on its scaled (time, features) series, e.g.
+# create_lstm_model(train_scaled['28079004'].to_numpy(), 4)
+def create_lstm_model(df_scaled, no_columns, units_layer_1=128, units_layer_2=64, dropout_rate=0.2, learning_rate=0.001,
+                      n_steps=24, epochs=100, batch_size=32, windows="dataset", cache_dir=None, shuffle_buffer=10000,
+                      verbose="auto"):
+    # windows="dataset": training windows are gathered on the fly with tf.data (memory independent of n_steps)
+    # windows="array":   strided NumPy views from make_windows are passed to model.fit
+    # windows="timeseries": timeseries_dataset_from_array windows, cached to cache_dir (in memory if None)
+    #                       under a name hashed from the data, so stations and runs can share cache_dir,
+    #                       shuffled through a buffer of shuffle_buffer windows and prefetched
+    model = build_lstm_model(no_columns, units_layer_1, units_layer_2, dropout_rate, learning_rate, n_steps)
+
+    # Splitting the windows into training and testing sets (80-20 split)
+    split = int(0.8 * (len(df_scaled) - n_steps))
+
+    # With Early Stopping
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    if windows == "dataset":
+        train_data = window_dataset(df_scaled, n_steps, batch_size, stop=split, shuffle=True)
+        val_data = window_dataset(df_scaled, n_steps, batch_size, start=split)
+        model.fit(train_data, epochs=epochs, validation_data=val_data, callbacks=[early_stopping], verbose=verbose)
+    elif windows == "timeseries":
+        cache = lambda subset: "" if cache_dir is None else os.path.join(cache_dir, subset)
+        train_data = timeseries_window_dataset(df_scaled, n_steps, batch_size, subset="train", cache=cache("train"),
+                                               shuffle_buffer=shuffle_buffer)
+        val_data = timeseries_window_dataset(df_scaled, n_steps, batch_size, subset="validation", cache=cache("validation"))
+        model.fit(train_data, epochs=epochs, validation_data=val_data, callbacks=[early_stopping], verbose=verbose)
+    else:
+        # Create X, y sequence
+        X, y = make_windows(df_scaled, n_steps)
+        X_train, X_test = X[:split], X[split:]
+        y_train, y_test = y[:split], y[split:]
+        model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_data=(X_test, y_test),
+                  callbacks=[early_stopping], verbose=verbose)
+
+    # Without Early STopping
+    #model.fit(X_train, y_train, epochs=epochs, batch_size=batch_size, validation_data=(X_test, y_test))
+
+    return model  # Return the trained model
+
+
+# One LSTM for all stations. The station code (e.g. 28079004) goes through an IntegerLookup +
+# Embedding and is fed next to the pollutant values at every time step; the rest mirrors
+# create_lstm_model (LSTM 128 -> LSTM 64 -> Dropout -> Dense). The vocabulary is saved with the
+# model, and a station it has not seen maps to the shared out-of-vocabulary embedding, so a new
+# station can be forecast (or fine-tuned) without training a new model.
+def build_global_lstm_model(stations, no_columns, embedding_dim=8, units_layer_1=128, units_layer_2=64,
+                            dropout_rate=0.2, learning_rate=0.001, n_steps=24):
+    window = Input(shape=(n_steps, no_columns), name='window')
+    station = Input(shape=(), dtype='int64', name='station')
+
+    station_index = IntegerLookup(vocabulary=[int(s) for s in stations], num_oov_indices=1, name='station_lookup')(station)
+    station_embedding = Embedding(len(stations) + 1, embedding_dim, name='station_embedding')(station_index)
+    station_steps = RepeatVector(n_steps)(station_embedding)
+
+    x = Concatenate(axis=-1)([window, station_steps])
+    # First LSTM layer
+    x = LSTM(units=units_layer_1, activation='relu', return_sequences=True)(x)
+    # Second LSTM layer
+    x = LSTM(units=units_layer_2, activation='relu')(x)
+    # Dropout layer
+    x = Dropout(dropout_rate)(x)
+    # Dense output layer
+    output = Dense(no_columns)(x)
+
+    model = Model(inputs={'window': window, 'station': station}, outputs=output, name='global_lstm')
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
+    return model
+
+
+# Train the shared model on every station at once, e.g. create_global_lstm_model(train_scaled, 4)
+# with train_scaled = {station: scaled frame}. Batches mix stations, so one fit replaces
+# one create_lstm_model run per station.
+def create_global_lstm_model(series_by_station, no_columns, embedding_dim=8, units_layer_1=128, units_layer_2=64,
+                             dropout_rate=0.2, learning_rate=0.001, n_steps=24, epochs=100, batch_size=32):
+    model = build_global_lstm_model(list(series_by_station), no_columns, embedding_dim, units_layer_1, units_layer_2,
+                                    dropout_rate, learning_rate, n_steps)
+
+    train_data = multi_window_dataset(series_by_station, n_steps, batch_size, subset="train", shuffle=True)
+    val_data = multi_window_dataset(series_by_station, n_steps, batch_size, subset="validation")
+
+    # With Early Stopping
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    model.fit(train_data, epochs=epochs, validation_data=val_data, callbacks=[early_stopping])
+
+    return model
+
+
+# Direct multi-horizon model: the create_lstm_model stack with a Dense(horizon * no_columns) head,
+# so all `horizon` hours come out of a single forward pass as (batch, horizon, no_columns).
+def build_direct_lstm_model(no_columns, horizon=24, units_layer_1=128, units_layer_2=64, dropout_rate=0.2,
+                            learning_rate=0.001, n_steps=24):
+    window = Input(shape=(n_steps, no_columns), name='window')
+    # First LSTM layer
+    x = LSTM(units=units_layer_1, activation='relu', return_sequences=True)(window)
+    # Second LSTM layer
+    x = LSTM(units=units_layer_2, activation='relu')(x)
+    # Dropout layer
+    x = Dropout(dropout_rate)(x)
+    # Dense output layer, one row per forecast hour
+    x = Dense(horizon * no_columns)(x)
+    output = Reshape((horizon, no_columns))(x)
+
+    model = Model(inputs=window, outputs=output, name=f'direct_lstm_{horizon}h')
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse')
+    return model
+
+
+# Train a direct model on one station, e.g. create_direct_lstm_model(train_scaled['28079016'].to_numpy(), 4, horizon=72).
+# Same 80/20 split and early stopping as create_lstm_model.
+def create_direct_lstm_model(df_scaled, no_columns, horizon=24, units_layer_1=128, units_layer_2=64, dropout_rate=0.2,
+                             learning_rate=0.001, n_steps=24, epochs=100, batch_size=32):
+    model = build_direct_lstm_model(no_columns, horizon, units_layer_1, units_layer_2, dropout_rate, learning_rate, n_steps)
+
+    X, Y = make_horizon_windows(df_scaled, n_steps, horizon)
+    split = int(0.8 * len(X))
+
+    # With Early Stopping
+    early_stopping = EarlyStopping(monitor='val_loss', patience=10, restore_best_weights=True)
+    model.fit(X[:split], Y[:split], epochs=epochs, batch_size=batch_size, validation_data=(X[split:], Y[split:]),
+              callbacks=[early_stopping])
+
+    return model
+
+
+# Recursive multi-horizon forecasts from a trained next-hour model (create_lstm_model or a loaded .keras).
+# The model's LSTM layers are re-created with return_state and its weights, the input window is run
+# once, and then each prediction is fed back as the next hour while the LSTM states are carried
+# forward, so every further hour costs one LSTM step instead of another pass over 24 hours.
+# Unlike re-windowing, the carried state still remembers hours older than n_steps.
+# Returns a compiled function: windows (batch, n_steps, features) -> (batch, horizon, features).
+def recursive_forecaster(model, horizon=24):
+    lstm_layers = [layer for layer in model.layers if isinstance(layer, LSTM)]
+    output_layer = model.layers[-1]
+    if not lstm_layers or not isinstance(output_layer, Dense):
+        raise ValueError("recursive_forecaster needs a next-hour LSTM model ending in a Dense layer")
+    no_columns = output_layer.units
+
+    step_layers = []
+    for layer in lstm_layers:
+        step_layer = LSTM.from_config({**layer.get_config(), 'return_sequences': True, 'return_state': True})
+        step_layer.build((None, None, layer.input.shape[-1]))
+        step_layer.set_weights(layer.get_weights())
+        step_layers.append(step_layer)
+
+    def step(x, states):
+        for i, layer in enumerate(step_layers):
+            x, h, c = layer(x, initial_state=states[i])
+            states[i] = [h, c]
+        return output_layer(x[:, -1])
+
+    @tf.function(input_signature=[tf.TensorSpec([None, None, no_columns], tf.float32)])
+    def forecast(window):
+        batch = tf.shape(window)[0]
+        states = [[tf.zeros([batch, layer.units]), tf.zeros([batch, layer.units])] for layer in step_layers]
+        y = step(window, states)
+        outputs = [y]
+        for _ in range(horizon - 1):
+            y = step(y[:, None, :], states)
+            outputs.append(y)
+        return tf.stack(outputs, axis=1)
+
+    return forecast
@@ -0,0 +1,130 @@
+import numpy as np
+
+
+QUANTIZATIONS = (None, "dynamic", "int8")
+
+
+# Copy of a Keras model with every LSTM unrolled over its fixed n_steps. The TFLite converter
+# then sees plain matmuls instead of a while loop, which int8 calibration cannot handle.
+def _unrolled(model):
+    config = model.get_config()
+    config['layers'] = [{**layer, 'config': {**layer['config'], 'unroll': True}} if layer['class_name'] == 'LSTM' else layer
+                        for layer in config['layers']]
+    unrolled = model.__class__.from_config(config)
+    unrolled.set_weights(model.get_weights())
+    return unrolled
+
+
+# Evenly spaced training windows in batches, used to calibrate the int8 activation ranges
+def _representative_windows(windows, max_windows=512, batch_size=32):
+    windows = np.asarray(windows, dtype=np.float32)
+    picks = windows[np.unique(np.linspace(0, len(windows) - 1, min(max_windows, len(windows))).astype(int))]
+    return lambda: ([picks[i:i + batch_size]] for i in range(0, len(picks), batch_size))
+
+
+# Convert a next-hour model (create_lstm_model / load_model) to a TFLite flatbuffer at `path`.
+# quantization: None keeps float32 weights, "dynamic" stores the weights as int8, and "int8" also quantizes
+# the activations, calibrated on `calibration_windows` (e.g. make_windows(train_scaled[station], 24)[0]).
+# Inputs and outputs stay float32, so the exported model is a drop-in replacement.
+def export_tflite(model, path, quantization=None, calibration_windows=None, n_steps=24, n_features=4, max_calibration=512):
+    import tensorflow as tf
+    from tensorflow.python.framework.convert_to_constants import convert_variables_to_constants_v2
+
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization '{quantization}', expected one of {QUANTIZATIONS}")
+    if quantization == "int8" and calibration_windows is None:
+        raise ValueError("int8 quantization needs calibration_windows from the training data")
+
+    unrolled = _unrolled(model)
+    function = tf.function(lambda window: unrolled(window, training=False),
+                           input_signature=[tf.TensorSpec([None, n_steps, n_features], tf.float32)])
+    frozen = convert_variables_to_constants_v2(function.get_concrete_function())
+
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([frozen], unrolled)
+    if quantization is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "int8":
+        converter.representative_dataset = _representative_windows(calibration_windows, max_calibration)
+
+    with open(path, 'wb') as tflite_file:
+        tflite_file.write(converter.convert())
+    return path
+
+
+# ONNX export through tf2onnx (optional dependency). quantization="dynamic" stores int8 weights
+# with onnxruntime's quantize_dynamic; for int8 activations use export_tflite.
+def export_onnx(model, path, quantization=None, n_steps=24, n_features=4, opset=13):
+    import tensorflow as tf
+    import tf2onnx
+
+    if quantization not in (None, "dynamic"):
+        raise ValueError(f"ONNX export supports quantization None or 'dynamic', got '{quantization}'")
+
+    unrolled = _unrolled(model)
+    function = tf.function(lambda window: unrolled(window, training=False),
+                           input_signature=[tf.TensorSpec([None, n_steps, n_features], tf.float32, name='window')])
+    tf2onnx.convert.from_function(function, input_signature=function.input_signature, opset=opset, output_path=path)
+
+    if quantization == "dynamic":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(path, path, weight_type=QuantType.QInt8)
+    return path
+
+
+# The smallest TFLite interpreter available: LiteRT, then tflite-runtime, then the one bundled with TensorFlow
+def _tflite_interpreter():
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+# Exported models behave like the compiled Keras ones: model(windows) -> (batch, features) NumPy array,
+# so they can be passed to InferenceEngine in place of the .keras models.
+class TFLiteModel:
+    def __init__(self, path, num_threads=None):
+        self.path = path
+        self.interpreter = _tflite_interpreter()(model_path=path, num_threads=num_threads)
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_index = self.interpreter.get_output_details()[0]['index']
+        self.batch_size = None
+
+    def __call__(self, windows):
+        windows = np.ascontiguousarray(windows, dtype=np.float32)
+        if len(windows) != self.batch_size:
+            self.interpreter.resize_tensor_input(self.input_index, windows.shape)
+            self.interpreter.allocate_tensors()
+            self.batch_size = len(windows)
+        self.interpreter.set_tensor(self.input_index, windows)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output_index).copy()
+
+
+class ONNXModel:
+    def __init__(self, path, num_threads=None):
+        import onnxruntime
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.path = path
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, windows):
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(windows, dtype=np.float32)})[0]
+
+
+def load_runtime_model(path, num_threads=None):
+    if path.endswith('.tflite'):
+        return TFLiteModel(path, num_threads)
+    if path.endswith('.onnx'):
+        return ONNXModel(path, num_threads)
+    raise ValueError(f"Unknown model format: {path}")
@@ -0,0 +1,161 @@
+import hashlib
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Input-output pairs for next-step prediction without copying the data:
+# X[i] = data[i:i + n_steps] and y[i] = data[i + n_steps], both read-only views of `data`.
+# Same values as the old create_sequences loops, but memory stays at one copy of the series.
+def make_windows(data, n_steps):
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    if len(data) <= n_steps:
+        raise ValueError(f"Need more than n_steps={n_steps} rows to build a window, got {len(data)}")
+
+    # sliding_window_view puts the window axis last: (samples, features, n_steps) -> (samples, n_steps, features)
+    windows = sliding_window_view(data, n_steps, axis=0).transpose(0, 2, 1)
+    return windows[:-1], data[n_steps:]
+
+
+# Multi-horizon version of make_windows: X[i] = data[i:i + n_steps] and Y[i] = data[i + n_steps:i + n_steps + horizon],
+# so Y has shape (samples, horizon, features). horizon=1 gives the make_windows pairs. Both are views of `data`.
+def make_horizon_windows(data, n_steps, horizon):
+    data = np.asarray(data)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    n_windows = len(data) - n_steps - horizon + 1
+    if n_windows <= 0:
+        raise ValueError(f"Need at least n_steps + horizon = {n_steps + horizon} rows, got {len(data)}")
+
+    X = sliding_window_view(data, n_steps, axis=0).transpose(0, 2, 1)[:n_windows]
+    Y = sliding_window_view(data[n_steps:], horizon, axis=0).transpose(0, 2, 1)
+    return X, Y
+
+
+# tf.data version of make_windows: only the window start indices are batched, and each batch
+# is gathered from a single copy of the series on the fly, so memory does not grow with n_steps.
+# `start`/`stop` select a range of windows (e.g. the 80/20 train/validation split).
+def window_dataset(data, n_steps, batch_size=32, start=0, stop=None, shuffle=False, seed=None):
+    import tensorflow as tf
+
+    data = np.asarray(data, dtype=np.float32)
+    if data.ndim == 1:
+        data = data.reshape(-1, 1)
+    n_windows = len(data) - n_steps
+    stop = n_windows if stop is None else min(stop, n_windows)
+
+    series = tf.constant(data)
+    offsets = tf.range(n_steps, dtype=tf.int64)
+
+    def gather(starts):
+        X = tf.gather(series, starts[:, None] + offsets[None, :])
+        y = tf.gather(series, starts + n_steps)
+        return X, y
+
+    dataset = tf.data.Dataset.range(start, stop)
+    if shuffle:
+        dataset = dataset.shuffle(stop - start, seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+# Windows of several stations in one tf.data pipeline, for the shared multi-station model.
+# Series are stored back to back in one tensor and windows never cross a station boundary.
+# Each station's first `split` fraction of windows is the training subset, the rest is validation
+# (the same 80/20 split create_lstm_model uses per station).
+# Yields ({'window': (batch, n_steps, features), 'station': (batch,) int station codes}, next step).
+def multi_window_dataset(series_by_station, n_steps, batch_size=32, subset="train", split=0.8, shuffle=False, seed=None):
+    import tensorflow as tf
+
+    if subset not in ("train", "validation", "all"):
+        raise ValueError(f"Unknown subset '{subset}', expected 'train', 'validation' or 'all'")
+
+    arrays, starts, stations = [], [], []
+    offset = 0
+    for station, series in series_by_station.items():
+        series = np.asarray(series, dtype=np.float32)
+        if series.ndim == 1:
+            series = series.reshape(-1, 1)
+        n_windows = len(series) - n_steps
+        cut = int(split * n_windows)
+        first, last = {"train": (0, cut), "validation": (cut, n_windows), "all": (0, n_windows)}[subset]
+
+        arrays.append(series)
+        starts.append(offset + np.arange(first, last, dtype=np.int64))
+        stations.append(np.full(last - first, int(station), dtype=np.int64))
+        offset += len(series)
+
+    series = tf.constant(np.concatenate(arrays))
+    offsets = tf.range(n_steps, dtype=tf.int64)
+
+    def gather(starts, stations):
+        X = tf.gather(series, starts[:, None] + offsets[None, :])
+        y = tf.gather(series, starts + n_steps)
+        return {'window': X, 'station': stations}, y
+
+    starts, stations = np.concatenate(starts), np.concatenate(stations)
+    dataset = tf.data.Dataset.from_tensor_slices((starts, stations))
+    if shuffle:
+        dataset = dataset.shuffle(len(starts), seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+# Training input built on keras.utils.timeseries_dataset_from_array, for data too large to window in memory.
+# The windows (24x the size of the series) are cached to disk on the first epoch, in a file named
+# `cache` plus a hash of the stations, their data, n_steps, split and subset, so a cache is never
+# reused for other data and different stations never share a file (cache="" keeps them in memory), reshuffled through a `shuffle_buffer` of windows every epoch and
+# prefetched while the model trains. Each station's series itself must fit in memory, but may be
+# a memory-mapped array (e.g. np.load(path, mmap_mode='r')).
+# `series` is one array or {station: series}; subset/split select the usual per-station 80/20 windows.
+# with_station=True yields ({'window', 'station'}, y) for the shared multi-station model.
+def timeseries_window_dataset(series, n_steps, batch_size=32, subset="train", split=0.8, cache=None,
+                              shuffle_buffer=None, seed=None, with_station=False):
+    import tensorflow as tf
+
+    if subset not in ("train", "validation", "all"):
+        raise ValueError(f"Unknown subset '{subset}', expected 'train', 'validation' or 'all'")
+    series_by_station = series if isinstance(series, dict) else {0: series}
+
+    datasets, weights = [], []
+    digest = hashlib.sha1(f"{n_steps}:{split}:{subset}".encode())
+    for station, values in series_by_station.items():
+        values = np.ascontiguousarray(values, dtype=np.float32)
+        if values.ndim == 1:
+            values = values.reshape(-1, 1)
+        digest.update(f"{station}:{values.shape}".encode())
+        digest.update(memoryview(values).cast('B'))
+        n_windows = len(values) - n_steps
+        cut = int(split * n_windows)
+        first, last = {"train": (0, cut), "validation": (cut, n_windows), "all": (0, n_windows)}[subset]
+        if last <= first:
+            continue
+
+        # Windows first..last-1: the last one ends at row last - 1 + n_steps (exclusive)
+        dataset = tf.keras.utils.timeseries_dataset_from_array(values, values[n_steps:], n_steps, batch_size=None,
+                                                               start_index=first, end_index=last - 1 + n_steps)
+        if with_station:
+            code = tf.constant(int(station), dtype=tf.int64)
+            dataset = dataset.map(lambda X, y, code=code: ({'window': X, 'station': code}, y),
+                                  num_parallel_calls=tf.data.AUTOTUNE)
+        datasets.append(dataset)
+        weights.append(last - first)
+
+    if not datasets:
+        raise ValueError(f"No {subset} windows of {n_steps} steps in the given series")
+    if len(datasets) == 1:
+        dataset = datasets[0]
+    else:
+        # Stations interleaved at random in proportion to their number of windows
+        dataset = tf.data.Dataset.sample_from_datasets(datasets, weights=[w / sum(weights) for w in weights],
+                                                       seed=seed, stop_on_empty_dataset=False)
+
+    if cache is not None:
+        if cache:
+            cache = f"{cache}_{digest.hexdigest()[:12]}"
+            os.makedirs(os.path.dirname(cache) or ".", exist_ok=True)
+        dataset = dataset.cache(cache)
+    if shuffle_buffer:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,328 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from air_data_preprocessor import (MONTH_FILES, TRAINING_STATIONS, RunningMinMaxScaler, feature_gases, get_catalog,
+                                   load_air_frames, station_frame)
+from air_sequences import make_windows, window_dataset
+
+
+# Search space over the create_lstm_model parameters: choices for the layer sizes,
+# (min, max, step) for the dropout rate and a log-uniform (min, max) range for the learning rate.
+TUNING_SPACE = {
+    'units_layer_1': [32, 64, 128, 256],
+    'units_layer_2': [16, 32, 64, 128],
+    'dropout_rate': (0.0, 0.5, 0.1),
+    'learning_rate': (1e-4, 1e-2),
+}
+TUNING_ALGORITHMS = ("hyperband", "bayesian")
+
+
+# Cap TensorFlow's thread pools in a worker process, so several workers share the CPU instead of
+# each one starting a thread per core. Must run before the worker builds its first model.
+def configure_threads(intra_op_threads=None, inter_op_threads=None):
+    import tensorflow as tf
+
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+# Process pool for TensorFlow work. Workers are spawned rather than forked, since a forked copy of a
+# process that already initialised TensorFlow (e.g. the notebook kernel) can deadlock.
+def training_pool(max_workers=None):
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+# Workers for `n_tasks` parallel jobs (at most one per core) and the intra-op threads each may use,
+# so that workers x threads does not exceed the number of cores.
+def worker_threads(n_tasks, max_workers=None, threads_per_worker=None):
+    cpus = os.cpu_count() or 1
+    max_workers = max_workers or max(1, min(n_tasks, cpus))
+    return max_workers, threads_per_worker or max(1, cpus // max_workers)
+
+
+def _series_digest(series):
+    return hashlib.sha1(np.ascontiguousarray(series, dtype=np.float32).tobytes()).hexdigest()[:12]
+
+
+# Windows of a station's scaled series, written once to {directory}/windows/ as .npy and memory-mapped
+# afterwards, so every tuner trial (in any worker process) reuses them instead of rebuilding the sequences.
+# The file name carries a hash of the series, so changed data never reuses stale windows.
+def cached_windows(series, station, n_steps=24, directory="tuning"):
+    base = os.path.join(directory, "windows", f"{station}_{n_steps}_{_series_digest(series)}")
+
+    if not (os.path.exists(f"{base}_X.npy") and os.path.exists(f"{base}_y.npy")):
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        X, y = make_windows(series, n_steps)
+        np.save(f"{base}_X.npy", X)
+        np.save(f"{base}_y.npy", y)
+    return np.load(f"{base}_X.npy", mmap_mode='r'), np.load(f"{base}_y.npy", mmap_mode='r')
+
+
+def best_config_path(station, directory="tuning"):
+    return os.path.join(directory, f"best_config_{station}.json")
+
+
+# Best parameters found for a station, ready for create_lstm_model(df_scaled, 4, **load_best_config(station))
+def load_best_config(station, directory="tuning"):
+    with open(best_config_path(station, directory), 'r') as json_file:
+        return json.load(json_file)['config']
+
+
+def _hypermodel(no_columns, n_steps, space):
+    def build(hp):
+        from air_models import build_lstm_model
+
+        dropout_min, dropout_max, dropout_step = space['dropout_rate']
+        return build_lstm_model(no_columns,
+                                units_layer_1=hp.Choice('units_layer_1', space['units_layer_1']),
+                                units_layer_2=hp.Choice('units_layer_2', space['units_layer_2']),
+                                dropout_rate=hp.Float('dropout_rate', dropout_min, dropout_max, step=dropout_step),
+                                learning_rate=hp.Float('learning_rate', *space['learning_rate'], sampling='log'),
+                                n_steps=n_steps)
+    return build
+
+
+# Hyperband or Bayesian search for one station on the usual 80/20 window split.
+# Bad trials stop early: Hyperband drops them after a few epochs, and every trial also stops once
+# val_loss has not improved for `patience` epochs. The best parameters are written to
+# {directory}/best_config_{station}.json and returned.
+def tune_station(station, series, n_steps=24, algorithm="hyperband", max_epochs=30, max_trials=20, batch_size=32,
+                 patience=5, directory="tuning", space=None, seed=0, intra_op_threads=None, inter_op_threads=None):
+    if algorithm not in TUNING_ALGORITHMS:
+        raise ValueError(f"Unknown algorithm '{algorithm}', expected one of {TUNING_ALGORITHMS}")
+    configure_threads(intra_op_threads, inter_op_threads)
+
+    import keras_tuner as kt
+    from tensorflow.keras.callbacks import EarlyStopping
+
+    space = space or TUNING_SPACE
+    X, y = cached_windows(series, station, n_steps, directory)
+    split = int(0.8 * len(X))
+
+    # The tuner resumes a project it finds on disk, so the project is named after everything the search
+    # depends on: an interrupted run picks up where it stopped, new data or settings start a new search
+    search = json.dumps({'data': _series_digest(series), 'n_steps': n_steps, 'algorithm': algorithm,
+                         'max_epochs': max_epochs, 'max_trials': max_trials, 'batch_size': batch_size,
+                         'patience': patience, 'space': space, 'seed': seed}, sort_keys=True)
+    project_name = f"lstm_{station}_{hashlib.sha1(search.encode()).hexdigest()[:12]}"
+
+    hypermodel = _hypermodel(X.shape[2], n_steps, space)
+    if algorithm == "hyperband":
+        tuner = kt.Hyperband(hypermodel, objective='val_loss', max_epochs=max_epochs, factor=3, seed=seed,
+                             directory=directory, project_name=project_name)
+    else:
+        tuner = kt.BayesianOptimization(hypermodel, objective='val_loss', max_trials=max_trials, seed=seed,
+                                        directory=directory, project_name=project_name)
+
+    early_stopping = EarlyStopping(monitor='val_loss', patience=patience)
+    tuner.search(X[:split], y[:split], validation_data=(X[split:], y[split:]), epochs=max_epochs,
+                 batch_size=batch_size, callbacks=[early_stopping], verbose=0)
+
+    best = tuner.oracle.get_best_trials(1)[0]
+    config = {name: best.hyperparameters.get(name) for name in space}
+    config['n_steps'] = n_steps
+    with open(best_config_path(station, directory), 'w') as json_file:
+        json.dump({'station': str(station), 'algorithm': algorithm, 'val_loss': best.score, 'config': config},
+                  json_file, indent=4)
+    return config
+
+
+# Tune several stations at once, one worker process per station, e.g. tune_stations(train_scaled).
+# The CPU cores are split between the workers. Returns {station: best config}.
+def tune_stations(series_by_station, max_workers=None, threads_per_worker=None, **tune_kwargs):
+    max_workers, threads_per_worker = worker_threads(len(series_by_station), max_workers, threads_per_worker)
+
+    with training_pool(max_workers) as executor:
+        futures = {station: executor.submit(tune_station, station, np.asarray(series, dtype=np.float32),
+                                            intra_op_threads=threads_per_worker, inter_op_threads=1, **tune_kwargs)
+                   for station, series in series_by_station.items()}
+        return {station: future.result() for station, future in futures.items()}
+
+
+def model_path(station, models_dir="lstm_models"):
+    return os.path.join(models_dir, f"lstm_model_{station}.keras")
+
+
+# Saved under a temporary name first, so an interrupted save never leaves a model behind that resume would skip
+def save_model(model, station, models_dir="lstm_models"):
+    path = model_path(station, models_dir)
+    partial_path = os.path.join(models_dir, f".partial_lstm_model_{station}.keras")
+    model.save(partial_path)
+    os.replace(partial_path, path)
+    return path
+
+
+def _train_station(station, series, models_dir, intra_op_threads, inter_op_threads, model_kwargs):
+    configure_threads(intra_op_threads, inter_op_threads)
+    from air_models import create_lstm_model
+
+    start = time.perf_counter()
+    model = create_lstm_model(series, series.shape[1], **model_kwargs)
+
+    return station, save_model(model, station, models_dir), time.perf_counter() - start
+
+
+# Train create_lstm_model for every station concurrently, one worker process per station, e.g.
+# train_stations(train_scaled, epochs=100). Each model is saved to {models_dir}/lstm_model_<station>.keras
+# as soon as it finishes. With resume=True, stations that already have a model there are skipped, so
+# re-running after an interruption only trains the missing ones. Returns {station: model path}.
+def train_stations(series_by_station, models_dir="lstm_models", max_workers=None, threads_per_worker=None,
+                   resume=True, **model_kwargs):
+    os.makedirs(models_dir, exist_ok=True)
+    pending = {station: series for station, series in series_by_station.items()
+               if not (resume and os.path.exists(model_path(station, models_dir)))}
+    if len(pending) < len(series_by_station):
+        print(f"Skipping {len(series_by_station) - len(pending)} stations already trained in {models_dir}")
+
+    if pending:
+        max_workers, threads_per_worker = worker_threads(len(pending), max_workers, threads_per_worker)
+        model_kwargs.setdefault('verbose', 0)
+        with training_pool(max_workers) as executor:
+            futures = [executor.submit(_train_station, station, np.asarray(series, dtype=np.float32), models_dir,
+                                       threads_per_worker, 1, model_kwargs)
+                       for station, series in pending.items()]
+            for future in as_completed(futures):
+                station, path, seconds = future.result()
+                print(f"{station}: saved {path} ({seconds:.0f} s)")
+
+    return {station: model_path(station, models_dir) for station in series_by_station}
+
+
+# Months whose NGSI-LD (or Arrow) files are on disk, in calendar order
+def available_months(source="json", root=None):
+    root = root or ("data_air_arrow" if source == "arrow" else "data_air_json")
+    return [month for month in MONTH_FILES if os.path.isdir(os.path.join(root, month))]
+
+
+# Which months each station's model in models_dir has been trained on: {station: [months]}
+def load_training_state(models_dir="lstm_models"):
+    path = os.path.join(models_dir, "training_state.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as json_file:
+        return json.load(json_file)
+
+
+def save_training_state(state, models_dir="lstm_models"):
+    path = os.path.join(models_dir, "training_state.json")
+    with open(path + ".partial", 'w') as json_file:
+        json.dump(state, json_file, indent=4)
+    os.replace(path + ".partial", path)
+
+
+# Unscaled aligned rows of a station, cached in {models_dir}/training_cache/<station>.npz and extended with
+# `frame` (new rows replace cached rows with the same observedAt). Returns the full (time, features) frame.
+def extend_training_cache(station, frame, models_dir="lstm_models"):
+    path = os.path.join(models_dir, "training_cache", f"{station}.npz")
+    new = pd.DataFrame(frame.to_numpy(dtype=np.float32),
+                       index=frame.index.get_level_values('observedAt').as_unit('ns').asi8)
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            new = pd.concat([pd.DataFrame(cached['values'], index=cached['times']), new])
+        new = new[~new.index.duplicated(keep='last')].sort_index()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.savez(path[:-len('.npz')] + ".partial.npz", times=new.index.to_numpy(), values=new.to_numpy())
+    os.replace(path[:-len('.npz')] + ".partial.npz", path)
+    return new
+
+
+def _finetune_station(station, series, new_rows, models_dir, epochs, learning_rate, replay_hours, n_steps,
+                      batch_size, intra_op_threads, model_kwargs):
+    configure_threads(intra_op_threads, 1)
+    from tensorflow.keras.callbacks import EarlyStopping
+    from tensorflow.keras.models import load_model
+    from air_models import create_lstm_model
+
+    start = time.perf_counter()
+    path = model_path(station, models_dir)
+    if not os.path.exists(path):
+        # New station: nothing to start from
+        model = create_lstm_model(series, series.shape[1], n_steps=n_steps, batch_size=batch_size, **model_kwargs)
+        return station, save_model(model, station, models_dir), "trained", time.perf_counter() - start
+
+    # Existing model: a few epochs at a low learning rate on the new rows plus the `replay_hours`
+    # before them (so the model does not forget the older months), with the usual 80/20 split
+    model = load_model(path)
+    model.optimizer.learning_rate = learning_rate
+    recent = series[max(0, len(series) - new_rows - replay_hours - n_steps):]
+    split = int(0.8 * (len(recent) - n_steps))
+    train_data = window_dataset(recent, n_steps, batch_size, stop=split, shuffle=True)
+    val_data = window_dataset(recent, n_steps, batch_size, start=split)
+    early_stopping = EarlyStopping(monitor='val_loss', patience=2, restore_best_weights=True)
+    model.fit(train_data, epochs=epochs, validation_data=val_data, callbacks=[early_stopping],
+              verbose=model_kwargs.get('verbose', 0))
+    return station, save_model(model, station, models_dir), "fine-tuned", time.perf_counter() - start
+
+
+# Monthly refresh without starting over, e.g. incremental_update() after a new month has been converted.
+# Per station, only the months it has not been trained on yet (see training_state.json) are read; they
+# are appended to the station's cached training rows, and its model in models_dir is fine-tuned from its
+# current weights for a few epochs. Stations without a model are trained from scratch on every month.
+# The scaler in {models_dir}/scaler.json is kept (the models were trained on that scaling); it is only
+# fitted when there is none yet. Stations run in parallel worker processes, and each one is recorded in
+# training_state.json as soon as it is saved, so an interrupted refresh resumes with the rest.
+# Without a training_state.json yet (models from train_stations), the first run reads every month once.
+def incremental_update(catalog=None, months=None, stations=TRAINING_STATIONS, models_dir="lstm_models", epochs=5,
+                       learning_rate=1e-4, replay_hours=24 * 28, n_steps=24, batch_size=32, gap_fill="interpolate",
+                       gap_limit=None, max_workers=None, threads_per_worker=None, source="json", root=None,
+                       **model_kwargs):
+    catalog = catalog or get_catalog()
+    months = list(months or available_months(source, root))
+    state = load_training_state(models_dir)
+    missing = {station: [month for month in months if month not in state.get(station, [])] for station in stations}
+    missing = {station: station_months for station, station_months in missing.items() if station_months}
+    if not missing:
+        print(f"Nothing new: every station is trained on {', '.join(months)}")
+        return {}
+
+    # Only the new files: stations that miss the same months are read together
+    by_months = defaultdict(list)
+    for station, station_months in missing.items():
+        by_months[tuple(station_months)].append(station)
+    frames = {}
+    for station_months, group in by_months.items():
+        gases = sorted({gas for station in group for gas in feature_gases(catalog, station)})
+        frames.update(load_air_frames(catalog, group, gases, list(station_months), source=source, root=root))
+
+    series, new_rows = {}, {}
+    for station, station_months in missing.items():
+        gas_frames = {gas: pd.concat([frames[(station, gas, month)] for month in station_months], ignore_index=True)
+                      for gas in feature_gases(catalog, station)}
+        new_frame, _ = station_frame(station, gas_frames, gap_fill, gap_limit)
+        series[station] = extend_training_cache(station, new_frame, models_dir).to_numpy()
+        new_rows[station] = len(new_frame)
+
+    os.makedirs(models_dir, exist_ok=True)
+    scaler_path = os.path.join(models_dir, "scaler.json")
+    if os.path.exists(scaler_path):
+        scaler = RunningMinMaxScaler.load(scaler_path)
+    else:
+        scaler = RunningMinMaxScaler().fit(series.values())
+        scaler.save(scaler_path)
+
+    max_workers, threads_per_worker = worker_threads(len(series), max_workers, threads_per_worker)
+    model_kwargs.setdefault('verbose', 0)
+    results = {}
+    with training_pool(max_workers) as executor:
+        futures = [executor.submit(_finetune_station, station, scaler.transform(values).astype(np.float32),
+                                   new_rows[station], models_dir, epochs, learning_rate, replay_hours, n_steps,
+                                   batch_size, threads_per_worker, model_kwargs)
+                   for station, values in series.items()]
+        for future in as_completed(futures):
+            station, path, action, seconds = future.result()
+            state[station] = [month for month in MONTH_FILES if month in set(state.get(station, [])) | set(missing[station])]
+            save_training_state(state, models_dir)
+            results[station] = path
+            print(f"{station}: {action} on {', '.join(missing[station])}, saved {path} ({seconds:.0f} s)")
+    return results
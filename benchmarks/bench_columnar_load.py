@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmark: loading the 9-station NO/NO2/NOx/O3 training set (jan-mar) from the
+# per-station NGSI-LD JSON files vs the memory-mapped Arrow cache.
+# Run from the repository root after converting to NGSI-LD, e.g.:
+#   python benchmarks/bench_columnar_load.py --build
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from air_data_preprocessor import reshape_air_quality_data, read_air_data, write_air_columnar, read_air_columnar
+
+MONTH_FILES = {'jan': 'ene_mo24.csv', 'feb': 'feb_mo24.csv', 'mar': 'mar_mo24.csv'}
+STATIONS = ['28079004', '28079016', '28079017', '28079027', '28079039',
+            '28079049', '28079054', '28079058', '28079059']
+GAS_SUFFIXES = {'no': '7_8', 'no2': '8_8', 'nox': '12_8', 'o3': '14_6'}
+
+
+def training_set():
+    # 28079004 has no O3 and uses CO instead, as in the preprocessor
+    for station in STATIONS:
+        gases = dict(GAS_SUFFIXES)
+        if station == '28079004':
+            del gases['o3']
+            gases['co'] = '6_48'
+        for gas, suffix in gases.items():
+            yield f"{station}_{suffix}", gas
+
+
+def load_json(root):
+    return [read_air_data(f"{root}/{month}/air_quality_observed_{station}_{month}.json", gas=gas)
+            for station, gas in training_set() for month in MONTH_FILES]
+
+
+def load_arrow(root):
+    return [read_air_columnar(month, gas, station, root)
+            for station, gas in training_set() for month in MONTH_FILES]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and Arrow cold-load time of the training set")
+    parser.add_argument("--json-root", default="data_air_json")
+    parser.add_argument("--arrow-root", default="data_air_arrow")
+    parser.add_argument("--csv-root", default="data/air_data")
+    parser.add_argument("--build", action="store_true", help="(re)build the Arrow cache from the CSVs first")
+    args = parser.parse_args()
+
+    if args.build:
+        for month, csv_name in MONTH_FILES.items():
+            df = reshape_air_quality_data(pd.read_csv(f"{args.csv_root}/{csv_name}", sep=';'))
+            write_air_columnar(df, month, args.arrow_root)
+
+    start = time.perf_counter()
+    json_frames = load_json(args.json_root)
+    t_json = time.perf_counter() - start
+
+    start = time.perf_counter()
+    arrow_frames = load_arrow(args.arrow_root)
+    t_arrow = time.perf_counter() - start
+
+    same = all(a['value'].reset_index(drop=True).equals(b['value']) for a, b in zip(json_frames, arrow_frames))
+    print(f"{len(json_frames)} station/gas/month frames")
+    print(f"JSON:    {t_json:8.3f} s")
+    print(f"Arrow:   {t_arrow:8.3f} s")
+    print(f"speedup: {t_json / t_arrow:8.1f}x")
+    print(f"same values: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
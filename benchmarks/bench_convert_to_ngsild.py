@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmark: row-wise (iterrows) vs vectorized convert_to_ngsild on a full month CSV.
+# The conversion is timed without file output first, then with the cumulative and per-station writers.
+# Run from the repository root:
+#   python benchmarks/bench_convert_to_ngsild.py data/air_data/ene_mo24.csv
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from air_data_preprocessor import reshape_air_quality_data, convert_to_ngsild
+
+
+# Original iterrows implementation, kept here as the reference for speed and output
+def convert_to_ngsild_rowwise(df, month, write=True):
+    entities = []
+
+    def generate_dataset_id():
+        return f"urn:ngsi-ld:{random.randint(1000000000, 9999999999)}"
+
+    for station in df['Station'].unique():
+        station_df = df[df['Station'] == station]
+        station_base = station.split("_")[0]
+
+        data = []
+        for _, row in station_df.iterrows():
+            if isinstance(row['Date'], pd.Timestamp):
+                date_value = row['Date']
+            else:
+                date_value = pd.to_datetime(row['Date'])
+
+            time_str = row['Time'].strip()
+
+            if time_str == "24:00":
+                date_value += pd.Timedelta(days=1)
+                time_str = "00:00"
+
+            date_str = date_value.strftime('%Y-%m-%d')
+
+            observed_at = f"{date_str}T{time_str}:00Z"
+            data.append({
+                "type": "Property",
+                "observedAt": observed_at,
+                "datasetId": generate_dataset_id(),
+                "value": row['Data'],
+                "unitCode": "GQ"
+            })
+
+        entity_1 = {
+            "id": f"urn:ngsi-ld:AirQualityObserved:{station_base}",
+            "type": "AirQualityObserved",
+            "refRoad": {
+                "type": "Relationship",
+                "object": f"urn:ngsi-ld:Road:{station_base}"
+            },
+            "temporalResolution": {
+                "type": "Property",
+                "value": "PT1H"
+            },
+            "nox": data,
+            "@context": [
+                "https://easy-global-market.github.io/c2jn-data-models/jsonld-contexts/c2jn-compound.jsonld"
+            ]
+        }
+
+        entities.append(entity_1)
+
+        if not write:
+            continue
+        with open(f"data_air_json/{month}/air_quality_observed_{station}_{month}.json", 'w') as json_file:
+            json.dump(entities, json_file, indent=4)
+
+    return entities
+
+
+def time_conversion(convert, df, month, seed):
+    random.seed(seed)
+    start = time.perf_counter()
+    entities = convert(df, month)
+    return time.perf_counter() - start, entities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare iterrows and vectorized convert_to_ngsild")
+    parser.add_argument("csv", nargs="?", default="data/air_data/ene_mo24.csv")
+    parser.add_argument("--month", default="jan")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = reshape_air_quality_data(pd.read_csv(args.csv, sep=';'))
+    print(f"{args.csv}: {len(df)} observations, {df['Station'].nunique()} series")
+
+    # Conversion only: the entities are built but no file is written
+    t_rowwise, rowwise = time_conversion(
+        lambda df, month: convert_to_ngsild_rowwise(df, month, write=False), df, args.month, args.seed)
+    t_vectorized, vectorized = time_conversion(
+        lambda df, month: convert_to_ngsild(df, month, writer=None), df, args.month, args.seed)
+
+    # With file output, inside a scratch directory
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "data_air_json", args.month))
+        os.chdir(tmp)
+        try:
+            t_rowwise_files, _ = time_conversion(convert_to_ngsild_rowwise, df, args.month, args.seed)
+            # Same cumulative file layout as the old loop
+            t_cumulative, _ = time_conversion(
+                lambda df, month: convert_to_ngsild(df, month, writer="cumulative"), df, args.month, args.seed)
+            # Default writer: each station's entity written once
+            t_station, _ = time_conversion(convert_to_ngsild, df, args.month, args.seed)
+        finally:
+            os.chdir(cwd)
+
+    identical = json.dumps(rowwise, indent=4) == json.dumps(vectorized, indent=4)
+    print("conversion only:")
+    print(f"  iterrows:   {t_rowwise:8.2f} s")
+    print(f"  vectorized: {t_vectorized:8.2f} s")
+    print(f"  speedup:    {t_rowwise / t_vectorized:8.1f}x")
+    print("with file output:")
+    print(f"  iterrows, cumulative writer:   {t_rowwise_files:8.2f} s")
+    print(f"  vectorized, cumulative writer: {t_cumulative:8.2f} s ({t_rowwise_files / t_cumulative:.1f}x)")
+    print(f"  vectorized, per-station writer: {t_station:7.2f} s ({t_rowwise_files / t_station:.1f}x)")
+    print(f"byte-identical entities: {identical}")
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
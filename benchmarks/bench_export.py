@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmark: a station's .keras model against its TFLite exports (float32, dynamic-range and int8).
+# Reports the file size, resident memory added by loading the model, single-window latency,
+# batched throughput and MAE/RMSE on the test windows (plus the largest deviation from .keras).
+# Run from the repository root after training, e.g.:
+#   python benchmarks/bench_export.py --model lstm_models/lstm_model_28079016.keras --station 28079016
+# or without data/models, on an untrained network and a random series:
+#   python benchmarks/bench_export.py --synthetic
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from air_sequences import make_windows
+from air_runtime import export_tflite, TFLiteModel
+
+
+def rss_mb():
+    # Current resident set size (Linux)
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+
+def synthetic_setup(n_steps):
+    from tensorflow.keras import Input, Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout
+
+    # Same architecture as create_lstm_model
+    model = Sequential([Input((n_steps, 4)),
+                        LSTM(128, activation='relu', return_sequences=True),
+                        LSTM(64, activation='relu'),
+                        Dropout(0.2),
+                        Dense(4)])
+    rng = np.random.default_rng(0)
+    hours = np.arange(3000)
+    series = 0.5 + 0.3 * np.sin(2 * np.pi * hours / 24)[:, None] + 0.05 * rng.standard_normal((3000, 4))
+    return model, series[:2800], series[2800 - n_steps:]
+
+
+def data_setup(model_path, station, scaler_path):
+    from tensorflow.keras.models import load_model
+    from air_data_preprocessor import get_training_data
+
+    data = get_training_data(scaler_path)
+    return load_model(model_path), data['train_scaled'][station].to_numpy(), data['test_scaled'][station].to_numpy()
+
+
+def measure(name, load, X_test, y_test, reference, repeat, batch_size):
+    before = rss_mb()
+    model = load()
+    model(X_test[:1])
+    memory = rss_mb() - before
+
+    single = []
+    for i in range(repeat):
+        window = X_test[i % len(X_test)][None]
+        start = time.perf_counter()
+        model(window)
+        single.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    predictions = np.concatenate([np.asarray(model(X_test[i:i + batch_size])) for i in range(0, len(X_test), batch_size)])
+    batched = time.perf_counter() - start
+
+    errors = predictions - y_test
+    deviation = np.abs(predictions - reference).max() if reference is not None else 0.0
+    print(f"{name:<14} {memory:>9.1f} {np.median(single) * 1000:>10.3f} {len(X_test) / batched:>12.0f} "
+          f"{np.abs(errors).mean():>9.5f} {np.sqrt((errors ** 2).mean()):>9.5f} {deviation:>11.2e}")
+    return predictions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare .keras and TFLite exports of a station model")
+    parser.add_argument("--model", help=".keras model to export")
+    parser.add_argument("--station", default="28079016")
+    parser.add_argument("--scaler", default=None, help="scaler JSON saved next to the models")
+    parser.add_argument("--synthetic", action="store_true", help="untrained model on a synthetic series")
+    parser.add_argument("--n-steps", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=200, help="single-window predictions to time")
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        model, train, test = synthetic_setup(args.n_steps)
+    elif args.model:
+        model, train, test = data_setup(args.model, args.station, args.scaler)
+    else:
+        parser.error("pass --model or --synthetic")
+
+    from air_inference import compile_model
+
+    X_train = np.ascontiguousarray(make_windows(train.astype(np.float32), args.n_steps)[0])
+    X_test, y_test = (np.ascontiguousarray(array) for array in make_windows(test.astype(np.float32), args.n_steps))
+
+    output_dir = tempfile.mkdtemp()
+    paths = {}
+    for quantization in (None, "dynamic", "int8"):
+        paths[quantization] = export_tflite(model, os.path.join(output_dir, f"model_{quantization or 'float'}.tflite"),
+                                            quantization, calibration_windows=X_train, n_steps=args.n_steps)
+
+    print(f"{len(X_test)} test windows, {args.repeat} single-window calls, batches of {args.batch_size}\n")
+    for quantization, path in paths.items():
+        print(f"tflite {quantization or 'float'} file: {os.path.getsize(path) / 2 ** 10:.0f} KiB")
+    print()
+    print(f"{'model':<14} {'RSS (MB)':>9} {'1-win (ms)':>10} {'windows/s':>12} {'MAE':>9} {'RMSE':>9} {'vs .keras':>11}")
+    reference = measure(".keras", lambda: compile_model(model, args.n_steps, 4), X_test, y_test, None,
+                        args.repeat, args.batch_size)
+    for quantization, path in paths.items():
+        measure(f"tflite {quantization or 'float'}", lambda: TFLiteModel(path), X_test, y_test, reference,
+                args.repeat, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Startup guard: `import air_data_preprocessor` must not load any data.
+# Each run imports the module in a fresh interpreter with pandas/numpy already imported
+# (the notebooks import them anyway) from an empty directory, so any file access at
+# import time fails, and times only the module itself.
+#   python benchmarks/bench_import_time.py --max-ms 50
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = """
+import time
+import pandas, numpy
+start = time.perf_counter()
+import air_data_preprocessor
+print(time.perf_counter() - start)
+"""
+
+
+def time_import(cwd):
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], cwd=cwd, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import failed:\n{result.stderr}")
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time `import air_data_preprocessor`")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as empty_dir:
+        times = [time_import(empty_dir) * 1000 for _ in range(args.runs)]
+
+    median = statistics.median(times)
+    print(f"import air_data_preprocessor: median {median:.1f} ms, max {max(times):.1f} ms over {args.runs} runs")
+    if median > args.max_ms:
+        print(f"FAIL: above {args.max_ms:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())